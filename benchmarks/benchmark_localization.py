@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""Scaling benchmark for PREDICT_LOCALIZATION.
+
+Generates synthetic all_samples_mergedtable-style data at a range of sizes and
+runs it through run() of modules/local/predict_localization/templates/
+predict_localization.py, the same function the pipeline calls, timing each
+stage (classification, build_webapp_table, CSV writing, write_report) and
+recording its peak memory. Results are written as JSON so runs from different
+releases can be compared with --compare.
+
+    python benchmarks/benchmark_localization.py --sizes 1000 100000 --output bench.json
+    python benchmarks/benchmark_localization.py --compare previous.json --output bench.json
+
+The data is generated sample by sample and written to a temporary CSV file
+(about 4 GB for the 10M-protein run), which run() then streams CHUNK_SIZE
+proteins at a time, so the benchmark needs no more memory than the pipeline
+itself.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(REPO_DIR, "modules", "local", "predict_localization", "templates", "predict_localization.py")
+
+DEFAULT_SIZES = [1000, 100000, 1000000, 10000000]
+STAGES = ["classification", "build_webapp_table", "csv_writing", "write_report"]
+
+# ---------------------------------------------------------------------------
+# Template loading
+# ---------------------------------------------------------------------------
+
+
+def load_template(path):
+    """Render the Nextflow template and import it as a module, without running its main block."""
+    with open(path) as f:
+        source = f.read()
+    placeholders = {
+        "${mergedtable}": "",
+        "${task.process}": "PREDICT_LOCALIZATION",
+        "${task.cpus}": "1",
+        "${columnar_output}": "false",
+    }
+    for placeholder, value in placeholders.items():
+        source = source.replace(placeholder, value)
+    source = re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), source)
+
+    module = types.ModuleType("predict_localization")
+    module.__file__ = path
+    # The template imports bin/columnar_output.py, which a task finds on its PATH.
+    sys.path.insert(0, os.path.join(REPO_DIR, "bin"))
+    # Registered so the report worker pool can find write_sample_report() by name.
+    sys.modules[module.__name__] = module
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+SIGNALP_CLASSES = ["OTHER", "SP", "LIPO", "TAT", "TATLIPO", "PILIN"]
+SIGNALP_COLUMNS = ["sign_other", "sign_sp_spI", "sign_lipo_spII", "sign_tat_spI", "sign_tatlipo_spII", "sign_pilin_spIII"]
+SIGNALP_FREQ = {
+    "negative": [0.80, 0.12, 0.05, 0.02, 0.005, 0.005],
+    "positive": [0.83, 0.08, 0.07, 0.01, 0.005, 0.005],
+    "unknown": [0.81, 0.10, 0.06, 0.02, 0.005, 0.005],
+}
+GRAM_FREQ = {"negative": 0.50, "positive": 0.45, "unknown": 0.05}
+PROTEIN_NAMES = [
+    "hypothetical protein", "ABC transporter ATP-binding protein", "ABC transporter permease",
+    "MFS transporter", "TonB-dependent receptor", "outer membrane protein assembly factor BamA",
+    "porin", "lipoprotein", "peptidoglycan-binding protein", "LysM peptidoglycan-binding domain-containing protein",
+    "sensor histidine kinase", "response regulator transcription factor", "DNA-binding protein",
+    "50S ribosomal protein L2", "30S ribosomal protein S4", "elongation factor Tu", "chaperonin GroEL",
+    "glycosyltransferase", "SusC/RagA family TonB-linked outer membrane protein", "efflux RND transporter permease subunit",
+    "sodium:solute symporter family protein", "cell wall anchor protein", "LPXTG cell wall anchor domain-containing protein",
+    "penicillin-binding protein", "flagellin", "type IV pilin", "thioredoxin", "alkaline phosphatase",
+    "beta-lactamase", "amidase", "zinc metalloprotease", "serine protease", "NADH-quinone oxidoreductase subunit",
+    "ATP synthase subunit c", "SecY translocase", "cytochrome c oxidase subunit I",
+]
+PSORT_SCORES = [7.5, 8.0, 8.96, 9.26, 9.49, 9.97, 10.0]
+PSORT_UNKNOWN_SCORES = [2.0, 2.5, 3.33, 4.95]
+
+
+def synthetic_sample(rng, sample_no, n_proteins, gram, tax_id):
+    """One sample's rows, with the columns and dtypes of all_samples_mergedtable.csv."""
+    n = n_proteins
+    sample_id = f"S{sample_no:05d}"
+
+    # SignalP: the predicted class carries most of the probability mass.
+    call = rng.choice(len(SIGNALP_CLASSES), n, p=SIGNALP_FREQ[gram])
+    probs = rng.dirichlet(np.full(len(SIGNALP_CLASSES), 0.3), n) * 0.2
+    probs[np.arange(n), call] += 0.8
+    probs = probs.round(6)
+    has_sp = call > 0
+    cs_site = rng.integers(18, 36, n)
+    cs_prob = rng.beta(8, 2, n)
+    sign_cspos = np.where(
+        has_sp,
+        [f"CS pos: {site}-{site + 1}. Pr: {p:.4f}" for site, p in zip(cs_site, cs_prob)],
+        None,
+    )
+
+    # TMHMM / Phobius: mostly soluble; helix counts agree for most membrane proteins.
+    predhel = rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 14], n,
+                         p=[0.70, 0.10, 0.04, 0.03, 0.03, 0.02, 0.02, 0.01, 0.02, 0.01, 0.01, 0.01])
+    predhel = np.where(has_sp & (rng.random(n) < 0.3), np.maximum(predhel, 1), predhel)
+    phob_tm = np.where(rng.random(n) < 0.85, predhel, np.maximum(predhel + rng.choice([-1, 1], n), 0))
+    phob_tm = np.where(has_sp & (predhel == 1) & (rng.random(n) < 0.7), 0, phob_tm)
+    phob_sp = np.where(has_sp, np.where(rng.random(n) < 0.8, "Y", "0"), np.where(rng.random(n) < 0.02, "Y", "0"))
+
+    # PSORTb: depends on the topology and, for outer membrane/periplasm, the Gram stain.
+    psort = np.where(rng.random(n) < 0.75, "Cytoplasmic", "Unknown").astype(object)
+    membrane = predhel >= 2
+    psort[membrane] = np.where(rng.random(membrane.sum()) < 0.85, "CytoplasmicMembrane", "Unknown")
+    secreted_options = {
+        "negative": (["Periplasmic", "Extracellular", "OuterMembrane", "Unknown"], [0.35, 0.15, 0.15, 0.35]),
+        "positive": (["Extracellular", "Cellwall", "CytoplasmicMembrane", "Unknown"], [0.40, 0.15, 0.15, 0.30]),
+        "unknown": (["Extracellular", "Periplasmic", "Unknown"], [0.35, 0.25, 0.40]),
+    }[gram]
+    secreted = has_sp & ~membrane
+    psort[secreted] = rng.choice(secreted_options[0], secreted.sum(), p=secreted_options[1])
+    if gram == "negative":
+        barrel = ~has_sp & ~membrane & (rng.random(n) < 0.02)
+        psort[barrel] = "OuterMembrane"
+    psort_score = np.where(
+        psort == "Unknown", rng.choice(PSORT_UNKNOWN_SCORES, n), rng.choice(PSORT_SCORES, n)
+    ).astype(float)
+    missing_psort = rng.random(n) < 0.02
+    psort[missing_psort] = None
+    psort_score[missing_psort] = np.nan
+
+    # A few proteins missing from the TMHMM output (left join in MERGE_TABLES).
+    predhel = predhel.astype(float)
+    predhel[rng.random(n) < 0.005] = np.nan
+
+    protein_id = [f"{sample_id}_{i:05d}" for i in range(n)]
+    protein_name = rng.choice(PROTEIN_NAMES, n, p=[0.3] + [0.7 / (len(PROTEIN_NAMES) - 1)] * (len(PROTEIN_NAMES) - 1))
+    length = rng.integers(80, 900, n)
+    membrane_count = np.nan_to_num(predhel) * 21
+    inside = ((length - membrane_count) * rng.random(n)).round()
+    outside = length - membrane_count - inside
+
+    data = {
+        "sample_id": sample_id,
+        "gram_stain": gram,
+        "meta_id": sample_id,
+        "tax_id": tax_id,
+        "protein_full": [f"{pid} {name}" for pid, name in zip(protein_id, protein_name)],
+        "sign_prediction": np.array(SIGNALP_CLASSES)[call],
+    }
+    data.update({col: probs[:, i] for i, col in enumerate(SIGNALP_COLUMNS)})
+    data.update({
+        "sign_cspos": sign_cspos,
+        "protein_id": protein_id,
+        "protein_name": protein_name,
+        "tmhmm_inside_count": inside,
+        "tmhmm_outside_count": outside,
+        "tmhmm_membrane_count": membrane_count,
+        "tmhmm_inside_prop": inside / length,
+        "tmhmm_outside_prop": outside / length,
+        "tmhmm_membrane_prop": membrane_count / length,
+        "PredHel": predhel,
+        "TM_60": (membrane_count * rng.random(n)).round(2),
+        "has_TM": predhel > 0,
+        "phob_TM": phob_tm,
+        "phob_SP": phob_sp,
+        "phob_prediction": np.where(phob_tm > 0, "i12-32o", np.where(phob_sp == "Y", "n5-16c21/22o", "o")),
+        "psort_prediction": psort,
+        "psort_score": psort_score,
+        "psort_secondaryloc": None,
+    })
+    return pd.DataFrame(data)
+
+
+def synthetic_chunks(n_proteins, chunk_size, seed):
+    """Yield DataFrames of whole samples (1,500-6,500 proteins each) of about chunk_size rows."""
+    rng = np.random.default_rng(seed)
+    grams = list(GRAM_FREQ)
+    sample_no = 0
+    remaining = n_proteins
+    parts = []
+    n_rows = 0
+    while remaining > 0:
+        size = min(remaining, int(rng.integers(1500, 6500)))
+        gram = grams[rng.choice(len(grams), p=list(GRAM_FREQ.values()))]
+        tax_id = f"taxon_{rng.integers(0, max(1, n_proteins // 12000) + 1)}"
+        parts.append(synthetic_sample(rng, sample_no, size, gram, tax_id))
+        sample_no += 1
+        remaining -= size
+        n_rows += size
+        if n_rows >= chunk_size or remaining == 0:
+            yield pd.concat(parts, ignore_index=True)
+            parts = []
+            n_rows = 0
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its own RSS high-water mark (VmHWM).
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+class StageTimer:
+    def __init__(self, stages):
+        self.stats = {stage: {"seconds": 0.0, "peak_rss_mb": 0.0} for stage in stages}
+        self.per_stage_peaks = True
+
+    @contextmanager
+    def __call__(self, stage):
+        self.per_stage_peaks &= reset_peak_rss()
+        start = time.perf_counter()
+        yield
+        stat = self.stats[stage]
+        stat["seconds"] += time.perf_counter() - start
+        stat["peak_rss_mb"] = max(stat["peak_rss_mb"], peak_rss_mb())
+
+
+def write_input(path, n_proteins, chunk_size, seed):
+    """Write the synthetic merged table to path, a chunk at a time."""
+    for chunk_no, df in enumerate(synthetic_chunks(n_proteins, chunk_size, seed)):
+        df.to_csv(path, mode="w" if chunk_no == 0 else "a", header=chunk_no == 0, index=False)
+
+
+def run_size(tpl, n_proteins, chunk_size, seed, workers, workdir):
+    """Run one size through the template's run(), timing each of its stages."""
+    mergedtable = os.path.join(workdir, "all_samples_mergedtable.csv")
+    start = time.perf_counter()
+    write_input(mergedtable, n_proteins, chunk_size, seed)
+    generate_seconds = time.perf_counter() - start
+
+    outdir = os.path.join(workdir, "results")
+    timer = StageTimer(STAGES)
+    tpl.CHUNK_SIZE = chunk_size
+    start = time.perf_counter()
+    summary = tpl.run(mergedtable, outdir, workers, stage=timer)
+    run_seconds = time.perf_counter() - start
+
+    report_bytes = sum(
+        os.path.getsize(os.path.join(outdir, name)) for name in os.listdir(outdir) if name.endswith(".html")
+    )
+    return {
+        "proteins": n_proteins,
+        "samples": summary["samples"],
+        "distinct_combinations": summary["distinct_combinations"],
+        "report_mode": summary["report_mode"],
+        "report_mb": round(report_bytes / 1e6, 2),
+        "generate_seconds": round(generate_seconds, 3),
+        "total_seconds": round(run_seconds, 3),
+        "per_stage_peaks": timer.per_stage_peaks,
+        "stages": {
+            stage: {"seconds": round(stat["seconds"], 3), "peak_rss_mb": round(stat["peak_rss_mb"], 1)}
+            for stage, stat in timer.stats.items()
+        },
+    }
+
+
+def print_results(results, baseline=None):
+    previous = {r["proteins"]: r for r in baseline["results"]} if baseline else {}
+    for result in results:
+        print(f"\n{result['proteins']:,} proteins ({result['samples']} samples, {result['report_mode']} report)")
+        for stage, stat in result["stages"].items():
+            line = f"  {stage:<20} {stat['seconds']:>10.2f} s {stat['peak_rss_mb']:>10.1f} MB"
+            old = previous.get(result["proteins"], {}).get("stages", {}).get(stage)
+            if old and old["seconds"] > 0:
+                line += f"   x{stat['seconds'] / old['seconds']:.2f} time, x{stat['peak_rss_mb'] / old['peak_rss_mb']:.2f} memory"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of proteins to benchmark")
+    parser.add_argument("--output", default="benchmark_localization.json", help="JSON results file to write")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--template", default=TEMPLATE, help="predict_localization.py template to benchmark")
+    parser.add_argument("--chunk-size", type=int, help="proteins per chunk (default: the template's CHUNK_SIZE)")
+    parser.add_argument("--workers", type=int, default=1, help="report worker processes (the task's CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tpl = load_template(args.template)
+    chunk_size = args.chunk_size or tpl.CHUNK_SIZE
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = []
+    for n_proteins in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"bench_{n_proteins}_")
+        try:
+            results.append(run_size(tpl, n_proteins, chunk_size, args.seed, args.workers, workdir))
+        finally:
+            shutil.rmtree(workdir)
+        print_results(results[-1:], baseline)
+
+    output = {
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "template": os.path.relpath(args.template, REPO_DIR),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "chunk_size": chunk_size,
+        "workers": args.workers,
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
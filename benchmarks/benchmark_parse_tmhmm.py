@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for bin/parse_tmhmm.py.
+
+Writes a synthetic TMHMM annotation file (_cat.txt) and summary table
+(_summary.tsv) for each size and times parse_annotation, parse_summary and
+merge_results on them, best of --repeat runs. Pass --baseline with an earlier
+version of the script to time both side by side, e.g.
+
+    git show <commit>:bin/parse_tmhmm.py > /tmp/parse_tmhmm_old.py
+    python benchmarks/benchmark_parse_tmhmm.py --baseline /tmp/parse_tmhmm_old.py
+
+PARSE_TMHMM runs once per SPLIT_PROTEINS chunk, so the default sizes go up to
+100,000 proteins per chunk.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, "bin", "parse_tmhmm.py")
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+STAGES = ["parse_annotation", "parse_summary", "merge_results"]
+
+
+def load_script(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_inputs(n_proteins, seed, workdir):
+    """Annotation and summary files for n_proteins proteins, with TMHMM's 60-residue topology lines."""
+    rng = np.random.default_rng(seed)
+    annotation = os.path.join(workdir, "chunk_cat.txt")
+    summary = os.path.join(workdir, "chunk_summary.tsv")
+    lengths = rng.integers(80, 1200, n_proteins)
+    n_helices = rng.choice([0, 0, 0, 1, 2, 7], n_proteins)
+    with open(annotation, "w") as anno, open(summary, "w") as summ:
+        summ.write("protein_ID\tPredHel\tTM_60\n")
+        for i, (length, helices) in enumerate(zip(lengths, n_helices)):
+            states = np.full(length, "i" if i % 2 else "o")
+            for start in rng.integers(0, max(length - 21, 1), helices):
+                states[start : start + 21] = "M"
+            topology = "".join(states)
+            anno.write(f">P{i:07d} hypothetical protein\n")
+            anno.write("".join(topology[j : j + 60] + "\n" for j in range(0, length, 60)))
+            summ.write(f"P{i:07d}\t{helices}\t{int(rng.integers(0, 40)) if helices else 0}\n")
+    return annotation, summary
+
+
+def time_script(module, annotation, summary, workdir, repeat):
+    """Best-of-repeat seconds per stage for one version of the script."""
+    best = {stage: float("inf") for stage in STAGES}
+    output = os.path.join(workdir, f"{module.__name__}_parsed.tsv")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        annotation_data = module.parse_annotation(annotation)
+        # parse_annotation may return records lazily; consume them inside its stage
+        if not isinstance(annotation_data, dict):
+            annotation_data = list(annotation_data)
+        parsed = time.perf_counter()
+        summary_data = module.parse_summary(summary)
+        summarised = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.merge_results(annotation_data, summary_data, output)
+        merged = time.perf_counter()
+        for stage, seconds in zip(STAGES, [parsed - start, summarised - parsed, merged - summarised]):
+            best[stage] = min(best[stage], seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of proteins per chunk")
+    parser.add_argument("--script", default=SCRIPT, help="parse_tmhmm.py to benchmark")
+    parser.add_argument("--baseline", help="earlier parse_tmhmm.py to compare against")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scripts = [("current", load_script(args.script, "current"))]
+    if args.baseline:
+        scripts.append(("baseline", load_script(args.baseline, "baseline")))
+
+    for n_proteins in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"bench_tmhmm_{n_proteins}_")
+        try:
+            annotation, summary = write_inputs(n_proteins, args.seed, workdir)
+            timings = {label: time_script(module, annotation, summary, workdir, args.repeat) for label, module in scripts}
+        finally:
+            shutil.rmtree(workdir)
+
+        print(f"\n{n_proteins:,} proteins")
+        for stage in STAGES + ["total"]:
+            seconds = {label: sum(t.values()) if stage == "total" else t[stage] for label, t in timings.items()}
+            line = f"  {stage:<18} {seconds['current']:>9.3f} s"
+            if "baseline" in seconds:
+                line += f"   baseline {seconds['baseline']:>9.3f} s   x{seconds['baseline'] / seconds['current']:.1f} faster"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Benchmark for bin/sanitise_fasta.py.
+
+Writes a synthetic proteome (50,000 proteins by default, 60-column sequence
+lines, with a sprinkling of selenocysteines, lower-case and unknown residues,
+CRLF line ends, blank lines and empty records) and times sanitise_fasta.py in
+its TMHMM and PSORTb modes, best of --repeat runs. With --baseline REV it also
+times the scripts it replaced as of git revision REV - the awk filter from
+modules/local/tmhmm/tmhmm.nf and bin/simplify_headers.sh - and checks that
+both produce the same FASTA:
+
+    python benchmarks/benchmark_sanitise_fasta.py --baseline <commit>
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, "bin", "sanitise_fasta.py")
+
+AMINO_ACIDS = np.frombuffer(b"ACDEFGHIKLMNPQRSTWVY", dtype=np.uint8)
+MODES = {
+    "tmhmm": ["--residues", "--log", "filter_fasta.log"],
+    "psortb": ["--simplify-headers", "--unwrap"],
+}
+
+
+def write_proteome(path, n_proteins, seed):
+    rng = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        for i in range(n_proteins):
+            r = rng.random()
+            if r < 0.05:
+                f.write(b">P%07d\tdescription after a tab\n" % i)
+            elif r < 0.07:
+                f.write(b">P%07d\n" % i)
+            else:
+                f.write(b">P%07d hypothetical protein [Synthetic taxon]\n" % i)
+            if rng.random() < 0.003:
+                continue
+            seq = AMINO_ACIDS[rng.integers(0, len(AMINO_ACIDS), rng.integers(50, 900))].tobytes()
+            if rng.random() < 0.05:
+                seq = seq[:10] + b"U" + seq[10:] + b"X*"
+            if rng.random() < 0.02:
+                seq = seq.lower()
+            eol = b"\r\n" if rng.random() < 0.01 else b"\n"
+            f.write(b"".join(seq[j : j + 60] + eol for j in range(0, len(seq), 60)))
+            if rng.random() < 0.01:
+                f.write(b"\n")
+
+
+def baseline_scripts(rev, workdir):
+    """Shell scripts running the awk filter and simplify_headers.sh as of `rev`, as `script in.faa out.faa`."""
+
+    def git_show(path):
+        return subprocess.run(["git", "-C", REPO_DIR, "show", f"{rev}:{path}"], check=True, capture_output=True, text=True).stdout
+
+    module = git_show("modules/local/tmhmm/tmhmm.nf")
+    start = module.index("awk -v allowed")
+    end = module.index('"${faa}" > ', start)
+    # Undo the Groovy escaping of the process script
+    awk = module[start:end].replace("\\$", "$").replace("\\\\", "\\")
+    tmhmm = os.path.join(workdir, "tmhmm_awk.sh")
+    with open(tmhmm, "w") as f:
+        f.write(f'allowed_chars="ACDEFGHIKLMNPQRSTWVYBZ"\n{awk}"$1" > "$2"\n')
+
+    psortb = os.path.join(workdir, "simplify_headers.sh")
+    with open(psortb, "w") as f:
+        f.write(git_show("bin/simplify_headers.sh"))
+    return {"tmhmm": ["bash", tmhmm], "psortb": ["bash", psortb]}
+
+
+def time_command(command, proteome, output, workdir, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command[:2] + [proteome, output] + command[2:], check=True, cwd=workdir, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--proteins", type=int, default=50000, help="number of proteins in the synthetic proteome")
+    parser.add_argument("--baseline", metavar="REV", help="git revision whose awk filter and simplify_headers.sh to compare against")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per script; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_fasta_")
+    try:
+        proteome = os.path.join(workdir, "proteome.faa")
+        write_proteome(proteome, args.proteins, args.seed)
+        baseline = baseline_scripts(args.baseline, workdir) if args.baseline else {}
+        print(f"{args.proteins:,} proteins, {os.path.getsize(proteome) / 1e6:.1f} MB")
+
+        for mode, options in MODES.items():
+            current = [sys.executable, SCRIPT] + options
+            seconds = time_command(current, proteome, os.path.join(workdir, f"{mode}.faa"), workdir, args.repeat)
+            line = f"  {mode:<8} {seconds:>8.2f} s"
+            if mode in baseline:
+                old_output = os.path.join(workdir, f"{mode}_baseline.faa")
+                old_seconds = time_command(baseline[mode], proteome, old_output, workdir, args.repeat)
+                same = filecmp.cmp(os.path.join(workdir, f"{mode}.faa"), old_output, shallow=False)
+                line += f"   baseline {old_seconds:>8.2f} s   x{old_seconds / seconds:.1f} faster, output {'identical' if same else 'DIFFERS'}"
+            print(line)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
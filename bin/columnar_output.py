@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Partitioned Parquet/Arrow output for --columnar_output.
+
+Imported by the COLLATE_MERGEDTABLES and PREDICT_LOCALIZATION templates, which
+find it on the task's PATH. Tables are written as Hive-style datasets
+(<root>/sample_id=<id>/<part>.parquet) that Arrow, pandas, DuckDB, Spark and
+Polars read as one table with sample_id as the partition column, or as Arrow
+IPC files if pyarrow was built without Parquet support.
+"""
+
+import os
+from urllib.parse import quote
+
+import pandas as pd
+
+def columnar_backend():
+    """(pyarrow, the function writing one file, the file extension)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise SystemExit("ERROR: --columnar_output needs pyarrow, which is not installed in this environment")
+    try:
+        import pyarrow.parquet as pq
+        return pa, pq.write_table, "parquet"
+    except ImportError:
+        import pyarrow.feather as feather
+        return pa, feather.write_feather, "arrow"
+
+def arrow_schema(pa, dtypes):
+    def arrow_type(dtype):
+        if pd.api.types.is_bool_dtype(dtype):
+            return pa.bool_()
+        if pd.api.types.is_integer_dtype(dtype):
+            return pa.int64()
+        if pd.api.types.is_float_dtype(dtype):
+            return pa.float64()
+        return pa.string()
+
+    # sample_id is encoded in the directory names, not stored in the files.
+    return pa.schema([(col, arrow_type(dtype)) for col, dtype in dtypes.items() if col != "sample_id"])
+
+def write_partitions(backend, schema, df, root, part_name):
+    """Writes each sample's rows of df to <root>/sample_id=<id>/<part_name>.<ext>."""
+    pa, write_table, ext = backend
+    os.makedirs(root, exist_ok=True)
+    for sample_id, part in df.groupby("sample_id", sort=False, dropna=False):
+        columns = {}
+        for field in schema:
+            col = part[field.name]
+            if pa.types.is_string(field.type):
+                col = col.astype(object).where(col.isna(), col.map(str))
+            columns[field.name] = col
+        table = pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+        key = "__HIVE_DEFAULT_PARTITION__" if pd.isna(sample_id) else quote(str(sample_id), safe="")
+        part_dir = os.path.join(root, f"sample_id={key}")
+        os.makedirs(part_dir, exist_ok=True)
+        write_table(table, os.path.join(part_dir, f"{part_name}.{ext}"))
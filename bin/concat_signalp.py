@@ -1,31 +1,84 @@
 #!/usr/bin/env python
 
-import pandas as pd
+import os
+import shutil
 import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+def read_chunk(input_file):
+    with open(input_file) as f:
+        # Skip the '# SignalP' comment line
+        f.readline()
+        return pd.read_csv(f, sep="\t")
+
+def common_dtype(a, b):
+    # The dtype pd.concat() gives two columns of the kinds read_csv produces
+    if a == b:
+        return a
+    numeric = all(pd.api.types.is_integer_dtype(d) or pd.api.types.is_float_dtype(d) for d in (a, b))
+    return np.dtype("float64") if numeric else np.dtype(object)
+
+def spill_chunks(input_files, spill_dir):
+    """Reads every chunk once, pickling it to spill_dir; returns the spill files and the table's column dtypes.
+
+    Every column gets one dtype over all chunks, as pd.concat() would give it,
+    with the columns in order of first appearance. A column missing from some
+    chunks is left empty there, so it can't stay integer or boolean.
+    """
+    paths = []
+    n_chunks_with = {}
+    seen = {}
+    for n, input_file in enumerate(input_files):
+        df = read_chunk(input_file)
+        for col, dtype in df.dtypes.items():
+            n_chunks_with[col] = n_chunks_with.get(col, 0) + 1
+            # An empty chunk's columns are all object, which says nothing about the values
+            if len(df):
+                seen[col] = common_dtype(seen.get(col, dtype), dtype)
+        paths.append(os.path.join(spill_dir, f"chunk_{n}.pkl"))
+        df.to_pickle(paths[-1])
+    dtypes = {}
+    for col, n in n_chunks_with.items():
+        dtype = seen.get(col, np.dtype(object))
+        dtypes[col] = common_dtype(dtype, np.dtype("float64")) if n < len(input_files) else dtype
+    return paths, dtypes
 
 def merge_files(meta_id, tax_id, output_filename, input_files):
-    # List to hold dataframes
-    df_list = []
+    """Streams each chunk into the merged table and, without OTHER predictions, the _filtered table."""
+    # Every chunk is written with the dtypes of the whole table, so e.g. a
+    # column that is integer in one chunk and float in another is written as
+    # float throughout. The chunks are parsed once, while the dtypes are
+    # resolved, and spilled to disk until then.
+    spill_dir = tempfile.mkdtemp(prefix="signalp_spill_", dir=".")
+    paths, dtypes = spill_chunks(input_files, spill_dir)
+    columns = list(dtypes)
+
+    base, ext = os.path.splitext(output_filename)
+    filtered_filename = f"{base}_filtered{ext}"
 
-    # Process each input file
-    for i, input_file in enumerate(input_files):
-        # Read the file, skipping comment lines (lines starting with '#')
-        # Read the file normally, and just skip the first line with '#'
-        df = pd.read_csv(input_file, sep="\t", skiprows=1)
+    with open(output_filename, 'w') as merged, open(filtered_filename, 'w') as filtered:
+        for i, path in enumerate(paths):
+            df = pd.read_pickle(path).reindex(columns=columns)
+            os.remove(path)
+            for col, dtype in dtypes.items():
+                if df[col].dtype != dtype and len(df):
+                    df[col] = df[col].astype(dtype)
 
-        # Add meta_id and tax_id columns as the first columns
-        df.insert(0, 'meta_id', meta_id)
-        df.insert(1, 'tax_id', tax_id)
+            # Add meta_id and tax_id columns as the first columns
+            df.insert(0, 'meta_id', meta_id)
+            df.insert(1, 'tax_id', tax_id)
 
-        # Append the dataframe to the list
-        df_list.append(df)
+            df.to_csv(merged, index=False, sep="\t", header=i == 0)
+            # Exclude proteins labeled as OTHER in the Prediction column
+            df[df['Prediction'] != 'OTHER'].to_csv(filtered, index=False, sep="\t", header=i == 0)
 
-    # Concatenate all dataframes into one
-    merged_df = pd.concat(df_list, ignore_index=True)
+    shutil.rmtree(spill_dir)
 
-    # Write the merged dataframe to a CSV file, including the header
-    merged_df.to_csv(output_filename, index=False, sep="\t")
     print(f"Merged file saved as {output_filename}")
+    print(f"Filtered file saved as {filtered_filename}")
 
 
 if __name__ == "__main__":
@@ -38,4 +91,4 @@ if __name__ == "__main__":
     output_filename = sys.argv[3]
     input_files = sys.argv[4:]
 
-    merge_files(meta_id, tax_id, output_filename, input_files)
\ No newline at end of file
+    merge_files(meta_id, tax_id, output_filename, input_files)
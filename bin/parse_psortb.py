@@ -1,100 +1,204 @@
 #!/usr/bin/env python3
 
-import re
+import argparse
 import csv
-import sys
+import io
+import locale
 import os
-
-def parse_psortb(input_file):
-    # Modified regex to only capture protein ID without expecting a name
-    seqid_re = re.compile(r'^SeqID:\s+(\S+)')  # Capture only Protein ID
-    final_prediction_header_re = re.compile(r'^\s*Final Prediction:$')  # Header
-    final_prediction_re = re.compile(r'^\s*(\S+)\s+(\d+\.\d+)$')  # Prediction + Score
-    secondary_localization_header_re = re.compile(r'^\s*Secondary localization\(s\):$')  # Header
-    secondary_localization_re = re.compile(r'^\s*(\S+)$')  # Capture Localization
-
-    # Determine output file name
-    base_name = os.path.splitext(input_file)[0]
-    output_file = f"{base_name}_filtered.csv"
-
-    print(f"Processing: {input_file}")
-    print(f"Writing results to: {output_file}")
-
-    # Open input and output files
-    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
-        writer = csv.writer(outfile, delimiter='\t')
-        writer.writerow(['Protein ID', 'Final Prediction', 'Score', 'Secondary Localization'])
-
-        protein_id = None
-        final_prediction = None
-        score = None
-        secondary_localization_list = []
-
-        final_prediction_next = False  # Track when next line is Final Prediction
-        secondary_localization_next = False  # Track when reading Secondary Localizations
-
-        for line in infile:
-            line = line.strip()
-
-            # Detect SeqID (new protein entry)
-            seqid_match = seqid_re.match(line)
-            if seqid_match:
-                # Write previous protein entry before starting new one
-                if protein_id and final_prediction:
-                    secondary_localization = ", ".join(secondary_localization_list) if secondary_localization_list else "N/A"
-                    writer.writerow([protein_id, final_prediction, score, secondary_localization])
-
-                # Start new protein entry
-                protein_id = seqid_match.group(1)
-                final_prediction = None
-                score = None
-                secondary_localization_list = []
-
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Files larger than this are cut into pieces of about this size at 'SeqID:'
+# lines and the pieces parsed by a pool of worker processes
+PIECE_BYTES = 32 * 1024 * 1024
+
+FINAL_PREDICTION_HEADER = "Final Prediction:"
+SECONDARY_LOCALIZATION_HEADER = "Secondary localization(s):"
+score_re = re.compile(r'\d+\.\d+')
+
+class ParserState:
+    """Where the parser is in the PSORTb output; carried from one piece of the file to the next."""
+
+    def __init__(self, final_prediction_next=False, secondary_localization_next=False):
+        self.final_prediction_next = final_prediction_next  # Track when next line is Final Prediction
+        self.secondary_localization_next = secondary_localization_next  # Track when reading Secondary Localizations
+
+    def flags(self):
+        return self.final_prediction_next, self.secondary_localization_next
+
+def parse_lines(lines, state, verbose=False):
+    """Parses PSORTb output lines into [protein ID, final prediction, score, secondary localization] rows.
+
+    Returns the rows, the number of Final Prediction lines that didn't hold a
+    prediction and score, and whether the last protein had a final prediction.
+    """
+    rows = []
+    n_invalid = 0
+    protein_id = None
+    final_prediction = None
+    score = None
+    secondary_localization_list = []
+
+    def protein_row():
+        secondary_localization = ", ".join(secondary_localization_list) if secondary_localization_list else "N/A"
+        return [protein_id, final_prediction, score, secondary_localization]
+
+    for line in lines:
+        line = line.strip()
+
+        # Detect SeqID (new protein entry): 'SeqID:', whitespace, then the protein ID
+        if line.startswith("SeqID:") and line[6:7].isspace():
+            # Write previous protein entry before starting new one
+            if protein_id and final_prediction:
+                rows.append(protein_row())
+
+            # Start new protein entry
+            protein_id = line[6:].split(None, 1)[0]
+            final_prediction = None
+            score = None
+            secondary_localization_list = []
+
+            if verbose:
                 print(f"Found Protein: {protein_id}")
-                continue
-
-            # Detect Final Prediction header
-            if final_prediction_header_re.match(line):
-                final_prediction_next = True
-                continue
-
-            # Capture Final Prediction
-            if final_prediction_next:
-                final_prediction_match = final_prediction_re.match(line)
-                if final_prediction_match:
-                    final_prediction = final_prediction_match.group(1)
-                    score = final_prediction_match.group(2)
+            continue
+
+        # Detect Final Prediction header
+        if line == FINAL_PREDICTION_HEADER:
+            state.final_prediction_next = True
+            continue
+
+        # Capture Final Prediction: the localization and its score
+        if state.final_prediction_next:
+            fields = line.split()
+            if len(fields) == 2 and score_re.fullmatch(fields[1]):
+                final_prediction, score = fields
+                if verbose:
                     print(f"  → Final Prediction: {final_prediction} (Score: {score})")
-                else:
+            else:
+                n_invalid += 1
+                if verbose:
                     print(f"  Warning: No valid Final Prediction found in line: {line}")
-                final_prediction_next = False
+            state.final_prediction_next = False
+            continue
+
+        # Detect Secondary Localization header
+        if line == SECONDARY_LOCALIZATION_HEADER:
+            state.secondary_localization_next = True
+            continue
+
+        # Capture Secondary Localizations, one per line
+        if state.secondary_localization_next:
+            if line and len(line.split()) == 1:
+                secondary_localization_list.append(line)
                 continue
+            else:
+                state.secondary_localization_next = False  # Stop if no match
+
+    # Write last protein entry
+    last_complete = bool(protein_id and final_prediction)
+    if last_complete:
+        rows.append(protein_row())
+    return rows, n_invalid, last_complete
+
+def piece_offsets(input_file, piece_bytes=PIECE_BYTES):
+    """Byte offsets cutting the file into pieces of about piece_bytes, each starting at a 'SeqID:' line."""
+    size = os.path.getsize(input_file)
+    offsets = [0]
+    with open(input_file, 'rb') as f:
+        while offsets[-1] + piece_bytes < size:
+            f.seek(offsets[-1] + piece_bytes)
+            f.readline()  # Move to the start of a line
+            cut = None
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                # Only cut where parse_lines() starts a new protein entry
+                if line.startswith(b"SeqID:") and line[6:7].isspace() and line[6:].strip():
+                    cut = position
+                    break
+            if cut is None:
+                break
+            offsets.append(cut)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def parse_piece(input_file, start, end, flags=(False, False)):
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(locale.getpreferredencoding(False))
+    state = ParserState(*flags)
+    rows, n_invalid, last_complete = parse_lines(io.StringIO(text, newline=None), state)
+    return rows, n_invalid, last_complete, state.flags()
+
+def parse_piece_args(args):
+    return parse_piece(*args)
+
+def parse_psortb(input_files, output_file=None, processes=1, verbose=False):
+    """Parses one or more PSORTb outputs, e.g. one per protein chunk, into one table in the order given."""
+    # Determine output file name
+    if output_file is None:
+        base_name = os.path.splitext(input_files[0])[0]
+        output_file = f"{base_name}_filtered.csv"
 
-            # Detect Secondary Localization header
-            if secondary_localization_header_re.match(line):
-                secondary_localization_next = True
-                continue
+    print(f"Processing: {input_files[0]}" if len(input_files) == 1 else f"Processing {len(input_files)} PSORTb outputs")
+    print(f"Writing results to: {output_file}")
 
-            # Capture Secondary Localizations
-            if secondary_localization_next:
-                secondary_localization_match = secondary_localization_re.match(line)
-                if secondary_localization_match:
-                    secondary_localization_list.append(secondary_localization_match.group(1))
-                    continue
-                else:
-                    secondary_localization_next = False  # Stop if no match
-
-        # Write last protein entry
-        if protein_id and final_prediction:
-            secondary_localization = ", ".join(secondary_localization_list) if secondary_localization_list else "N/A"
-            writer.writerow([protein_id, final_prediction, score, secondary_localization])
+    pieces = []
+    if verbose:
+        # Per-protein messages are printed as the files are read, so each is read in one piece
+        for input_file in input_files:
+            with open(input_file, 'r', buffering=PIECE_BYTES) as infile:
+                rows, n_invalid, last_complete = parse_lines(infile, ParserState(), verbose=True)
+            pieces.append((input_file, rows, n_invalid, last_complete))
+    else:
+        jobs = [(input_file, start, end) for input_file in input_files for start, end in piece_offsets(input_file)]
+        if processes > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(parse_piece_args, jobs))
         else:
-            print("No valid final prediction found for the last entry.")
+            results = [parse_piece(*job) for job in jobs]
+
+        # Each piece was parsed from the state at the start of a protein entry. The
+        # Final Prediction and Secondary localization states don't end at 'SeqID:'
+        # lines, so a piece that begins while one is still open is parsed again.
+        # Every file starts from a fresh state
+        flags = (False, False)
+        for i, (job, result) in enumerate(zip(jobs, results)):
+            if i > 0 and job[0] != jobs[i - 1][0]:
+                flags = (False, False)
+            if flags != (False, False):
+                result = parse_piece(*job, flags=flags)
+            pieces.append((job[0],) + result[:3])
+            flags = result[3]
+
+    # Open output file
+    n_proteins = 0
+    with open(output_file, 'w', newline='') as outfile:
+        writer = csv.writer(outfile, delimiter='\t')
+        writer.writerow(['Protein ID', 'Final Prediction', 'Score', 'Secondary Localization'])
+        for _, rows, _, _ in pieces:
+            writer.writerows(rows)
+            n_proteins += len(rows)
+
+    n_invalid = sum(piece[2] for piece in pieces)
+    if n_invalid and not verbose:
+        print(f"Warning: {n_invalid} Final Prediction lines held no valid prediction and score (see --verbose)")
+    # The last piece of each file holds its last entry
+    last_pieces = {input_file: last_complete for input_file, _, _, last_complete in pieces}
+    for input_file, last_complete in last_pieces.items():
+        if not last_complete:
+            where = f" of {input_file}" if len(input_files) > 1 else ""
+            print(f"No valid final prediction found for the last entry{where}.")
+    print(f"Wrote {n_proteins} proteins")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: ./parse_psortb.py <input_file>", file=sys.stderr)
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    parse_psortb(input_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract the final and secondary localizations from PSORTb's verbose output.")
+    parser.add_argument("input_files", nargs="+", help="PSORTb verbose outputs, parsed and written in this order")
+    parser.add_argument("--output", help="output table (default: <first input>_filtered.csv)")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for files larger than 32 MB")
+    parser.add_argument("--verbose", action="store_true", help="print every protein's prediction, as the parser used to")
+    args = parser.parse_args()
+
+    parse_psortb(args.input_files, args.output, args.processes, args.verbose)
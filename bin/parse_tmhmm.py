@@ -2,110 +2,100 @@
 import sys
 import pandas as pd
 
+# TMHMM labels each residue i(nside), o(utside) or M(embrane); translate()
+# folds the labels to lower case and drops every other byte, so the states
+# are counted with two count() calls per protein.
+STATE_TABLE = bytes.maketrans(b"IOM", b"iom")
+NON_STATES = bytes(set(range(256)) - set(b"iIoOmM"))
+
+def topology_record(protein_ID, protein_name, topology_lines):
+    states = b"".join(topology_lines).translate(STATE_TABLE, NON_STATES)
+    inside_count = states.count(b'i')
+    outside_count = states.count(b'o')
+    membrane_count = len(states) - inside_count - outside_count
+    total = inside_count + outside_count + membrane_count
+
+    inside_prop = inside_count / total if total > 0 else 0
+    outside_prop = outside_count / total if total > 0 else 0
+    membrane_prop = membrane_count / total if total > 0 else 0
+    return (protein_ID, protein_name, inside_count, outside_count, membrane_count,
+            inside_prop, outside_prop, membrane_prop)
+
 def parse_annotation(file_path):
-    """Parses the TMHMM .annotation file and extracts sequence composition details."""
-    data = []
-    
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-    
-    sequence = ""
-    results = {}
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if line.startswith('>'):
-            if sequence:
-                inside_count = sequence.count('i') + sequence.count('I')
-                outside_count = sequence.count('o') + sequence.count('O')
-                membrane_count = sequence.count('m') + sequence.count('M')
-                total = inside_count + outside_count + membrane_count
-                
-                inside_prop = inside_count / total if total > 0 else 0
-                outside_prop = outside_count / total if total > 0 else 0
-                membrane_prop = membrane_count / total if total > 0 else 0
-                
-                results[protein_ID] = [protein_ID, protein_name, inside_count, outside_count, membrane_count, 
-                                       inside_prop, outside_prop, membrane_prop]
-            
-            # Extract protein_ID and protein_name
-            header_parts = line[1:].split(' ', 1)
-            protein_ID = header_parts[0]
-            protein_name = header_parts[1] if len(header_parts) > 1 else "unknown"
-            
-            # Prepare to collect sequence
-            sequence = ""
-        elif line:
-            sequence += line
-        
-        # If end of file, process the collected sequence
-        if i == len(lines) - 1 and sequence:
-            inside_count = sequence.count('i') + sequence.count('I')
-            outside_count = sequence.count('o') + sequence.count('O')
-            membrane_count = sequence.count('m') + sequence.count('M')
-            total = inside_count + outside_count + membrane_count
-            
-            inside_prop = inside_count / total if total > 0 else 0
-            outside_prop = outside_count / total if total > 0 else 0
-            membrane_prop = membrane_count / total if total > 0 else 0
-            
-            results[protein_ID] = [protein_ID, protein_name, inside_count, outside_count, membrane_count, 
-                                   inside_prop, outside_prop, membrane_prop]
-    
-    return results
+    """Streams the TMHMM .annotation file, yielding one sequence composition record per protein.
+
+    Records are (protein_ID, protein_name, inside_count, outside_count,
+    membrane_count, inside_prop, outside_prop, membrane_prop) tuples. Only one
+    protein's topology lines are held at a time; proteins without any are skipped.
+    """
+    protein_ID = None
+    topology_lines = []
+
+    with open(file_path, 'rb') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith(b'>'):
+                if topology_lines:
+                    yield topology_record(protein_ID, protein_name, topology_lines)
+
+                # Extract protein_ID and protein_name
+                header_parts = line[1:].decode().split(' ', 1)
+                protein_ID = header_parts[0]
+                protein_name = header_parts[1] if len(header_parts) > 1 else "unknown"
+
+                topology_lines = []
+            elif line and protein_ID is not None:
+                topology_lines.append(line)
+
+    if topology_lines:
+        yield topology_record(protein_ID, protein_name, topology_lines)
 
 def parse_summary(file_path):
-    """Parses the summary file and extracts PredHel and TM_60."""
-    summary_data = {}
+    """Parses the summary file into PredHel and TM_60 columns indexed by protein_ID."""
     try:
-        df = pd.read_csv(file_path, sep='\t', header=None, names=["protein_ID", "PredHel", "TM_60"])
-        
+        df = pd.read_csv(file_path, sep='\t', header=None, names=["protein_ID", "PredHel", "TM_60"],
+                         dtype={"protein_ID": str})
+
         # Convert columns to numeric
         df["PredHel"] = pd.to_numeric(df["PredHel"], errors='coerce').fillna(0).astype(int)
         df["TM_60"] = pd.to_numeric(df["TM_60"], errors='coerce').fillna(0).astype(int)
-        
-        for _, row in df.iterrows():
-            protein_ID = row["protein_ID"]
-            summary_data[protein_ID] = {
-                "PredHel": int(row["PredHel"]),
-                "TM_60": int(row["TM_60"])
-            }
+
+        # A protein listed twice keeps its last counts
+        summary_data = df.drop_duplicates("protein_ID", keep="last").set_index("protein_ID")
     except Exception as e:
         print(f"Error in parse_summary: {e}")
-        # Return empty dict if file parsing failed
-    
+        # Return an empty table if file parsing failed
+        summary_data = pd.DataFrame({"PredHel": [], "TM_60": []}, dtype=int)
+
     return summary_data
 
 def merge_results(annotation_data, summary_data, output_path):
-    """Merges annotation and summary data and writes to a TSV file."""
-    df = pd.DataFrame(annotation_data.values(), columns=["protein_ID", "protein_name", "inside_count", "outside_count", 
-                                                         "membrane_count", "inside_prop", "outside_prop", "membrane_prop"])
-    
-    # Map PredHel and TM_60 counts and ensure they're numeric
-    df["PredHel"] = df["protein_ID"].map(lambda x: summary_data.get(x, {}).get("PredHel", 0))
-    df["PredHel"] = pd.to_numeric(df["PredHel"], errors='coerce').fillna(0).astype(int)
-    
-    df["TM_60"] = df["protein_ID"].map(lambda x: summary_data.get(x, {}).get("TM_60", 0))
-    df["TM_60"] = pd.to_numeric(df["TM_60"], errors='coerce').fillna(0).astype(int)
-    
+    """Merges annotation records and summary data and writes to a TSV file."""
+    # A protein listed twice keeps its first position and its last record
+    annotation_data = {record[0]: record for record in annotation_data}
+    df = pd.DataFrame(list(annotation_data.values()), columns=["protein_ID", "protein_name", "inside_count", "outside_count",
+                                                               "membrane_count", "inside_prop", "outside_prop", "membrane_prop"])
+
+    # Join PredHel and TM_60 counts on protein_ID; proteins missing from the summary get 0
+    df = df.join(summary_data[["PredHel", "TM_60"]], on="protein_ID")
+    df[["PredHel", "TM_60"]] = df[["PredHel", "TM_60"]].fillna(0).astype(int)
+
     # Ensure membrane_prop is numeric
     df["membrane_prop"] = pd.to_numeric(df["membrane_prop"], errors='coerce').fillna(0)
-    
+
     # Create a new column that flags proteins with transmembrane helices
     df["has_TM"] = (df["PredHel"] > 0) | (df["membrane_prop"] > 0.05)  # Consider membrane proportion > 5% as having TM
-    
-    # Save complete data
-    df.to_csv(output_path, sep='\t', index=False)
-    
-    # Create a filtered file with only TM-containing proteins
-    tm_proteins = df[df["has_TM"]].copy()
+
+    # Save complete data, and a filtered file with only TM-containing proteins
     tm_output_path = output_path.replace('.tsv', '_tm_only.tsv')
     if not tm_output_path.endswith('.tsv'):
         tm_output_path = output_path + '.tm_only'
-    tm_proteins.to_csv(tm_output_path, sep='\t', index=False)
-    
+    df.to_csv(output_path, sep='\t', index=False)
+    n_tm = int(df["has_TM"].sum())
+    df[df["has_TM"]].to_csv(tm_output_path, sep='\t', index=False)
+
     print(f"Total proteins: {len(df)}")
-    print(f"Proteins with TM domains: {len(tm_proteins)}")
+    print(f"Proteins with TM domains: {n_tm}")
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Derives Phobius' short-format summary (phobius -short) from its long output (phobius -long).
+
+    phobius_short.py sample_long.txt sample_summary.txt
+
+Each protein's long-format entry lists its features in sequence order:
+
+    ID   HIP_MOUSE
+    FT   SIGNAL        1     19
+    FT   REGION        1      2       N-REGION.
+    FT   REGION        3     14       H-REGION.
+    FT   REGION       15     19       C-REGION.
+    FT   TOPO_DOM     20     56       NON CYTOPLASMIC.
+    FT   TRANSMEM     57     77
+    FT   TOPO_DOM     78    120       CYTOPLASMIC.
+    //
+
+and its short-format line has the number of TRANSMEM features, Y or 0 for
+a signal peptide, and the topology as one string: the signal peptide's
+h-region and cleavage site, then each topological domain (TOPO_DOM, or
+DOMAIN for proteins without TM segments) as i (cytoplasmic) or o
+(non-cytoplasmic) with the TM segments between them:
+
+    HIP_MOUSE                       1  Y n3-14c19/20o57-77i
+
+With --compare, the derived summary is checked line by line against a
+`phobius -short` output of the same proteins.
+"""
+
+import argparse
+import sys
+
+SHORT_HEADER = "SEQENCE ID                     TM SP PREDICTION"
+
+def short_line(protein_id, features):
+    """The short-format line for one protein, from its (key, start, end, description) features."""
+    n_tm = 0
+    signal_end = None
+    h_region = None
+    topology = []
+    for key, start, end, description in features:
+        if key == "SIGNAL":
+            signal_end = end
+        elif key == "REGION" and description.startswith("H-REGION"):
+            h_region = (start, end)
+        elif key in ("TOPO_DOM", "DOMAIN"):
+            topology.append("o" if description.startswith("NON CYTOPLASMIC") else "i")
+        elif key == "TRANSMEM":
+            n_tm += 1
+            topology.append(f"{start}-{end}")
+
+    prediction = ""
+    if signal_end is not None:
+        h_start, h_end = h_region if h_region else (1, signal_end)
+        prediction = f"n{h_start}-{h_end}c{signal_end}/{int(signal_end) + 1}"
+    prediction += "".join(topology)
+    return "%-30s %2d %2s %s" % (protein_id, n_tm, "Y" if signal_end is not None else "0", prediction)
+
+def read_long(long_file):
+    """Yields (protein ID, features) for every entry in a Phobius long-format output."""
+    protein_id = None
+    features = []
+    with open(long_file) as f:
+        for line in f:
+            if line.startswith("ID "):
+                protein_id = line[2:].strip()
+                features = []
+            elif line.startswith("FT ") and protein_id is not None:
+                fields = line[2:].split(None, 3)
+                if len(fields) >= 3:
+                    features.append((fields[0], fields[1], fields[2], fields[3].strip() if len(fields) == 4 else ""))
+            elif line.startswith("//") and protein_id is not None:
+                yield protein_id, features
+                protein_id = None
+    if protein_id is not None:
+        yield protein_id, features
+
+def write_short(long_file, output_file):
+    n_proteins = 0
+    with open(output_file, "w") as out:
+        out.write(SHORT_HEADER + "\n")
+        for protein_id, features in read_long(long_file):
+            out.write(short_line(protein_id, features) + "\n")
+            n_proteins += 1
+    print(f"Wrote the short-format summary of {n_proteins} proteins to {output_file}")
+
+def compare(derived_file, short_file):
+    """Counts the lines that differ between two short-format outputs, ignoring column padding."""
+    with open(derived_file) as f:
+        derived = [line.split() for line in f]
+    with open(short_file) as f:
+        expected = [line.split() for line in f]
+    n_differ = abs(len(derived) - len(expected))
+    for line, (ours, theirs) in enumerate(zip(derived, expected), start=1):
+        if ours != theirs:
+            n_differ += 1
+            if n_differ <= 10:
+                print(f"line {line}: derived {' '.join(ours)!r}, phobius -short {' '.join(theirs)!r}", file=sys.stderr)
+    print(f"{n_differ} of {len(expected)} lines differ from {short_file}")
+    return n_differ
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("long_file", help="phobius -long output")
+    parser.add_argument("output_file", help="short-format summary to write")
+    parser.add_argument("--compare", metavar="SHORT", help="phobius -short output of the same proteins to check the summary against")
+    args = parser.parse_args()
+
+    write_short(args.long_file, args.output_file)
+    if args.compare and compare(args.output_file, args.compare):
+        sys.exit(1)
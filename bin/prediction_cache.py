@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Persistent SQLite cache of per-protein SignalP, TMHMM, Phobius and PSORTb results.
+
+    prediction_cache.py lookup CACHE.db sample.faa sample --versions signalp=6.0.1,... --gram gram-negative
+    prediction_cache.py merge sample --meta-id S1 --tax-id 562 --versions ... --containers signalp=barbarahelena/signalp:6.0.1,... --gram ... \\
+        --signalp S1_signalp.csv --tmhmm tmhmm_S1_concat.csv --psortb S1_psortb_filtered.csv --phobius S1_summary.txt
+    prediction_cache.py store CACHE.db S1_cache_rows.jsonl S2_cache_rows.jsonl ...
+
+Results are keyed by the SHA-256 of the protein's sequence as
+bin/sanitise_fasta.py --residues writes it for TMHMM (U replaced by C, any
+other character outside ALLOWED_RESIDUES dropped), the tool, the tool's
+version and, for PSORTb only, the Gram stain it ran with. A row is stored
+without the columns that name the protein or the sample, which are filled
+in again from the sample being merged, so a protein found under another
+ID or in another sample is still a hit. Each row also records the container
+the tool ran in.
+
+`lookup` writes <sample>_uncached.faa, with the proteins that aren't
+cached for every tool, <sample>_cache_manifest.tsv, listing every protein
+in FASTA order, and <sample>_cache_hits.jsonl with the cached rows of the
+rest. When every protein is cached, the first one is still written to
+<sample>_uncached.faa, so the tools have something to run on.
+
+`merge` puts the cached rows back into each tool's table, in FASTA order,
+writes the freshly computed rows of the other proteins to
+<sample>_cache_rows.jsonl and writes a <sample>_cache_stats.tsv line. With
+--containers, the containers the tools ran in are checked against the
+versions the cache is keyed on: if a container's tag isn't its tool's
+version, nothing is stored for the sample, as the rows would be cached
+under the wrong version. Cached rows that came from another container than
+this run's are counted in a warning.
+
+`store` adds the rows of every sample to the cache in one transaction. It is
+the only command that writes to the cache, and the pipeline runs it once,
+after every sample has been merged, so the cache never has two writers;
+`lookup` opens it read-only.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from urllib.parse import quote
+
+from sanitise_fasta import residue_filter
+
+TOOLS = ("signalp", "tmhmm", "psortb", "phobius")
+# Only PSORTb is run differently for Gram-positive and Gram-negative samples
+GRAM_TOOLS = ("psortb",)
+# PSORTb leaves out proteins without a valid final prediction, so "no row" is a
+# result worth caching; a protein missing from another tool's table is not cached
+OPTIONAL_TOOLS = ("psortb",)
+QUERY_BATCH = 500
+ID_COLUMNS = {"signalp": "# ID", "tmhmm": "protein_ID", "psortb": "Protein ID", "phobius": "ID"}
+
+PHOBIUS_HEADER = "SEQENCE ID                     TM SP PREDICTION"
+PHOBIUS_COLUMNS = ["ID", "TM", "SP", "PREDICTION"]
+
+RESIDUE_TABLE, RESIDUE_DELETE = residue_filter()
+
+def sequence_key(sequence):
+    return hashlib.sha256(sequence.translate(RESIDUE_TABLE, RESIDUE_DELETE)).hexdigest()
+
+def read_fasta(input_file):
+    """Yields (header, sequence key, record bytes) for every record in a FASTA file."""
+    header = None
+    record = []
+    sequence = []
+    with open(input_file, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                if header is not None:
+                    yield header, sequence_key(b"".join(sequence)), b"".join(record)
+                header = line[1:].decode(errors="replace").strip()
+                record = []
+                sequence = []
+            elif header is not None:
+                sequence.append(line)
+            if header is not None:
+                record.append(line if line.endswith(b"\n") else line + b"\n")
+    if header is not None:
+        yield header, sequence_key(b"".join(sequence)), b"".join(record)
+
+def protein_fields(tool, header, meta_id=None, tax_id=None):
+    """The columns of a tool's row that name the protein and the sample, for a FASTA header."""
+    first_word = header.split(None, 1)[0] if header.split() else ""
+    if tool == "signalp":
+        return {"meta_id": meta_id, "tax_id": tax_id, "# ID": header}
+    if tool == "tmhmm":
+        parts = header.split(" ", 1)
+        return {"meta_id": meta_id, "tax_id": tax_id, "protein_ID": parts[0],
+                "protein_name": parts[1] if len(parts) > 1 else "unknown"}
+    if tool == "psortb":
+        return {"Protein ID": first_word}
+    return {"ID": first_word}
+
+def protein_id(tool, fields):
+    """The protein ID in a row, or in protein_fields(); SignalP's ID column holds the whole header."""
+    value = fields.get(ID_COLUMNS[tool]) or ""
+    if tool == "signalp":
+        return value.split(None, 1)[0] if value.split() else ""
+    return value
+
+def parse_versions(versions):
+    parsed = dict(item.split("=", 1) for item in versions.split(",") if item)
+    missing = [tool for tool in TOOLS if tool not in parsed]
+    if missing:
+        sys.exit(f"--versions has no version for {', '.join(missing)}")
+    return parsed
+
+def container_tag(container):
+    """The tag of a container image, e.g. 6.0.1 for docker://barbarahelena/signalp:6.0.1."""
+    name = container.rsplit("/", 1)[-1]
+    return name.split(":", 1)[1] if ":" in name else ""
+
+def open_cache(cache_file, readonly=False):
+    if readonly:
+        return sqlite3.connect(f"file:{quote(os.path.abspath(cache_file))}?mode=ro", uri=True)
+    db = sqlite3.connect(cache_file)
+    db.execute("""CREATE TABLE IF NOT EXISTS predictions (
+                      tool TEXT NOT NULL, version TEXT NOT NULL, gram TEXT NOT NULL,
+                      sequence_hash TEXT NOT NULL, row TEXT, container TEXT,
+                      PRIMARY KEY (tool, version, gram, sequence_hash))""")
+    return db
+
+def tool_gram(tool, gram):
+    return gram if tool in GRAM_TOOLS else ""
+
+def fetch(db, tool, version, gram, keys):
+    """{sequence hash: (row, container)} for the keys cached for one tool; row is None for a cached "no row"."""
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), QUERY_BATCH):
+        batch = keys[i:i + QUERY_BATCH]
+        query = ("SELECT sequence_hash, row, container FROM predictions WHERE tool = ? AND version = ? AND gram = ? "
+                 f"AND sequence_hash IN ({','.join('?' * len(batch))})")
+        for key, row, container in db.execute(query, [tool, version, tool_gram(tool, gram)] + batch):
+            found[key] = (json.loads(row) if row is not None else None, container)
+    return found
+
+def lookup(cache_file, input_file, prefix, versions, gram):
+    versions = parse_versions(versions)
+    proteins = list(read_fasta(input_file))
+    keys = {key for _, key, _ in proteins}
+
+    if os.path.exists(cache_file):
+        db = open_cache(cache_file, readonly=True)
+        cached = {tool: fetch(db, tool, versions[tool], gram, keys) for tool in TOOLS}
+        db.close()
+    else:
+        # Created by the first `store`
+        cached = {tool: {} for tool in TOOLS}
+    hits = [all(key in cached[tool] for tool in TOOLS) for _, key, _ in proteins]
+    if proteins and all(hits):
+        hits[0] = False
+
+    with open(f"{prefix}_uncached.faa", "wb") as faa, \
+         open(f"{prefix}_cache_manifest.tsv", "w", newline="") as manifest, \
+         open(f"{prefix}_cache_hits.jsonl", "w") as hits_file:
+        writer = csv.writer(manifest, delimiter="\t", lineterminator="\n")
+        writer.writerow(["header", "sequence_hash", "cached"])
+        for (header, key, record), hit in zip(proteins, hits):
+            writer.writerow([header, key, int(hit)])
+            if hit:
+                entry = {"sequence_hash": key, **{tool: cached[tool][key][0] for tool in TOOLS},
+                         "containers": {tool: cached[tool][key][1] for tool in TOOLS}}
+                hits_file.write(json.dumps(entry) + "\n")
+            else:
+                faa.write(record)
+
+    n_hits = sum(hits)
+    print(f"{n_hits} of {len(proteins)} proteins found in {cache_file}; {len(proteins) - n_hits} left to predict")
+
+def read_table(tool, table_file):
+    """Header and rows of one tool's table; Phobius' short format is read into PHOBIUS_COLUMNS."""
+    if tool == "phobius":
+        rows = []
+        with open(table_file) as f:
+            f.readline()
+            for line in f:
+                fields = line.split(None, 3)
+                if fields:
+                    rows.append(dict(zip(PHOBIUS_COLUMNS, fields + [""] * (4 - len(fields)))))
+                    rows[-1]["PREDICTION"] = rows[-1]["PREDICTION"].strip()
+        return PHOBIUS_COLUMNS, rows
+    with open(table_file, newline="") as f:
+        reader = csv.DictReader(f, delimiter="\t")
+        return reader.fieldnames or [], list(reader)
+
+def write_table(tool, table_file, header, rows):
+    if tool == "phobius":
+        with open(table_file, "w") as f:
+            f.write(PHOBIUS_HEADER + "\n")
+            for row in rows:
+                f.write("%-30s %2s %2s %s\n" % (row["ID"], row["TM"], row["SP"], row["PREDICTION"]))
+        return
+    with open(table_file, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([row.get(column, "") for column in header])
+
+def merge(prefix, meta_id, tax_id, versions, gram, tables, outputs, containers=""):
+    versions = parse_versions(versions)
+    # Without containers (e.g. with conda) there is nothing to check
+    containers = dict(item.split("=", 1) for item in containers.split(",") if item)
+    mismatched = [tool for tool in TOOLS if containers.get(tool) and container_tag(containers[tool]) != versions[tool]]
+    for tool in mismatched:
+        print(f"WARNING: {tool} ran in {containers[tool]}, but the cache is keyed on {tool} version {versions[tool]} "
+              f"(--prediction_cache_versions); this sample's results are not stored", file=sys.stderr)
+    with open(f"{prefix}_cache_manifest.tsv", newline="") as f:
+        manifest = list(csv.DictReader(f, delimiter="\t"))
+    with open(f"{prefix}_cache_hits.jsonl") as f:
+        hits = {}
+        for line in f:
+            entry = json.loads(line)
+            hits[entry.pop("sequence_hash")] = entry
+    other_containers = {}
+    for entry in hits.values():
+        for tool, container in entry.pop("containers", {}).items():
+            if containers.get(tool) and container and container != containers[tool]:
+                other_containers[tool, container] = other_containers.get((tool, container), 0) + 1
+    for (tool, container), n in other_containers.items():
+        print(f"WARNING: {n} cached {tool} results of the same version came from {container}, "
+              f"not {containers[tool]}", file=sys.stderr)
+
+    computed = {}
+    headers = {}
+    for tool in TOOLS:
+        headers[tool], rows = read_table(tool, tables[tool])
+        by_protein = {}
+        for row in rows:
+            by_protein.setdefault(protein_id(tool, row), []).append(row)
+        computed[tool] = by_protein
+
+    merged = {tool: [] for tool in TOOLS}
+    to_store = []
+    for protein in manifest:
+        header, key = protein["header"], protein["sequence_hash"]
+        if protein["cached"] == "1":
+            for tool in TOOLS:
+                if hits[key][tool] is not None:
+                    merged[tool].append({**hits[key][tool], **protein_fields(tool, header, meta_id, tax_id)})
+            continue
+
+        results = {}
+        for tool in TOOLS:
+            identity = protein_fields(tool, header)
+            rows = computed[tool].pop(protein_id(tool, identity), [])
+            merged[tool].extend(rows)
+            if len(rows) == 1:
+                results[tool] = {column: value for column, value in rows[0].items() if column not in identity}
+            elif not rows and tool in OPTIONAL_TOOLS:
+                results[tool] = None
+        # Only proteins with exactly one row from every tool are stored
+        if len(results) == len(TOOLS) and not mismatched:
+            to_store.extend((tool, versions[tool], tool_gram(tool, gram), key,
+                             json.dumps(row) if row is not None else None, containers.get(tool))
+                            for tool, row in results.items())
+
+    # Rows that didn't match a protein in the FASTA file are kept, at the end
+    for tool in TOOLS:
+        for rows in computed[tool].values():
+            merged[tool].extend(rows)
+        write_table(tool, outputs[tool], headers[tool], merged[tool])
+
+    with open(f"{prefix}_cache_rows.jsonl", "w") as f:
+        for entry in to_store:
+            f.write(json.dumps(entry) + "\n")
+
+    n_hits = sum(protein["cached"] == "1" for protein in manifest)
+    n_stored = len(to_store) // len(TOOLS)
+    with open(f"{prefix}_cache_stats.tsv", "w") as f:
+        f.write("sample\tproteins\tcache_hits\tpredicted\tstored\thit_rate\n")
+        hit_rate = n_hits / len(manifest) if manifest else 0
+        f.write(f"{meta_id}\t{len(manifest)}\t{n_hits}\t{len(manifest) - n_hits}\t{n_stored}\t{hit_rate:.4f}\n")
+    print(f"Merged {n_hits} cached and {len(manifest) - n_hits} predicted proteins; {n_stored} to store in the cache")
+
+def store(cache_file, rows_files):
+    db = open_cache(cache_file)
+    n_rows = 0
+    with db:
+        for rows_file in rows_files:
+            with open(rows_file) as f:
+                rows = [json.loads(line) for line in f]
+            db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)", rows)
+            n_rows += len(rows)
+    db.close()
+    print(f"Stored {n_rows} rows from {len(rows_files)} samples in {cache_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    lookup_parser = subparsers.add_parser("lookup", help="split a proteome into cached and uncached proteins")
+    lookup_parser.add_argument("cache_file", help="SQLite cache, opened read-only; no protein is cached if it doesn't exist")
+    lookup_parser.add_argument("input_file", help="protein FASTA file")
+    lookup_parser.add_argument("prefix", help="prefix of the output files")
+
+    merge_parser = subparsers.add_parser("merge", help="merge cached rows into the tool tables and list the new ones to store")
+    merge_parser.add_argument("prefix", help="prefix given to lookup")
+    merge_parser.add_argument("--meta-id", required=True)
+    merge_parser.add_argument("--tax-id", required=True)
+    for tool in TOOLS:
+        merge_parser.add_argument(f"--{tool}", required=True, help=f"{tool} table of the uncached proteins")
+        merge_parser.add_argument(f"--{tool}-output", required=True, help=f"{tool} table to write")
+
+    store_parser = subparsers.add_parser("store", help="add the rows listed by merge to the cache")
+    store_parser.add_argument("cache_file", help="SQLite cache, created if missing")
+    store_parser.add_argument("rows_files", nargs="+", help="<sample>_cache_rows.jsonl files written by merge")
+
+    for subparser in (lookup_parser, merge_parser):
+        subparser.add_argument("--versions", required=True, help="tool=version for each of " + ", ".join(TOOLS))
+        subparser.add_argument("--gram", default="", help="Gram stain PSORTb runs with")
+    merge_parser.add_argument("--containers", default="", help="tool=container each tool ran in, checked against --versions and stored with the results")
+    args = parser.parse_args()
+
+    if args.command == "lookup":
+        lookup(args.cache_file, args.input_file, args.prefix, args.versions, args.gram)
+    elif args.command == "store":
+        store(args.cache_file, args.rows_files)
+    else:
+        tables = {tool: getattr(args, tool) for tool in TOOLS}
+        outputs = {tool: getattr(args, f"{tool}_output") for tool in TOOLS}
+        merge(args.prefix, args.meta_id, args.tax_id, args.versions, args.gram, tables, outputs, args.containers)
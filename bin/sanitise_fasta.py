@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Streams a protein FASTA file into a cleaned-up copy for the prediction tools.
+
+    sanitise_fasta.py in.faa out.faa --residues --log filter_fasta.log   # TMHMM
+    sanitise_fasta.py in.faa out.faa --simplify-headers --unwrap         # PSORTb
+
+--residues replaces U (selenocysteine) with C and drops every character
+outside ALLOWED_RESIDUES. --simplify-headers cuts headers at the first space,
+and --unwrap writes each sequence on one line, dropping blank lines and
+records without a header or sequence. Each sequence line is rewritten with a
+single bytes.translate() call; per-sequence counts of what was changed go to
+--log, totals to stdout.
+"""
+
+import argparse
+import sys
+
+# Characters TMHMM accepts - excluding X
+ALLOWED_RESIDUES = b"ACDEFGHIKLMNPQRSTWVYBZ"
+POSIX_SPACE = b" \t\n\v\f\r"
+
+def residue_filter(allowed=ALLOWED_RESIDUES):
+    """Translate table and delete set that map U to C and drop everything not in `allowed`."""
+    table = bytes.maketrans(b"U", b"C")
+    delete = bytes(set(range(256)) - set(allowed) - {ord("U")})
+    return table, delete
+
+def simplify_header(line):
+    # Cut at the first space, but only when there's whitespace after the first character of the ID
+    if any(c in POSIX_SPACE for c in line[2:]):
+        return line.split(b" ", 1)[0]
+    return line
+
+class Stats:
+    def __init__(self, log):
+        self.log = log
+        self.sequences = 0
+        self.modified = 0
+        self.removed = 0
+        self.replaced = 0
+        self.header = None
+        self.seq_removed = 0
+        self.seq_replaced = 0
+
+    def start(self, header):
+        self.finish()
+        self.sequences += 1
+        self.header = header
+
+    def finish(self):
+        if self.seq_removed or self.seq_replaced:
+            self.modified += 1
+            if self.log:
+                seq_id = self.header[1:].split(maxsplit=1)[0].decode(errors="replace") if self.header else ""
+                self.log.write(f"Sequence {self.sequences} ({seq_id}): removed {self.seq_removed} characters, "
+                               f"replaced {self.seq_replaced} U with C\n")
+        self.removed += self.seq_removed
+        self.replaced += self.seq_replaced
+        self.seq_removed = self.seq_replaced = 0
+
+    def summary(self):
+        average = self.removed / self.modified if self.modified else 0
+        return (f"Modified {self.modified} out of {self.sequences} sequences\n"
+                f"Total characters removed: {self.removed}\n"
+                f"Total U replaced with C: {self.replaced}\n"
+                f"Average removed per affected sequence: {average:.6g}\n")
+
+def sanitise_fasta(input_file, output_file, residues=False, simplify_headers=False, unwrap=False, log_file=None):
+    table, delete = residue_filter() if residues else (None, None)
+    log = open(log_file, "w") if log_file else None
+    stats = Stats(log)
+    written = 0
+    header = None
+    pieces = []
+
+    def flush():
+        nonlocal written
+        if header is not None and pieces:
+            out.write(header + b"\n" + b"".join(pieces) + b"\n")
+            written += 1
+
+    with open(input_file, "rb") as inp, open(output_file, "wb") as out:
+        for line in inp:
+            if line.endswith(b"\n"):
+                line = line[:-1]
+            if unwrap and not line:
+                continue
+            if line.startswith(b">"):
+                stats.start(line)
+                if simplify_headers:
+                    line = simplify_header(line)
+                if unwrap:
+                    flush()
+                    header, pieces = line, []
+                else:
+                    out.write(line + b"\n")
+                continue
+            if residues:
+                stats.seq_replaced += line.count(b"U")
+                cleaned = line.translate(table, delete)
+                stats.seq_removed += len(line) - len(cleaned)
+                line = cleaned
+            if unwrap:
+                pieces.append(line)
+            else:
+                out.write(line + b"\n")
+        if unwrap:
+            flush()
+    stats.finish()
+
+    if log:
+        log.write(stats.summary())
+        log.close()
+    print(f"Processed {stats.sequences} sequences into {output_file}" + (f" ({written} written)" if unwrap else ""))
+    if residues:
+        sys.stdout.write(stats.summary())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="FASTA file to clean up")
+    parser.add_argument("output", help="FASTA file to write")
+    parser.add_argument("--residues", action="store_true", help="replace U with C and drop characters outside the allowed alphabet")
+    parser.add_argument("--simplify-headers", action="store_true", help="cut headers at the first space")
+    parser.add_argument("--unwrap", action="store_true", help="write each sequence on one line, dropping blank lines and empty records")
+    parser.add_argument("--log", help="file for per-sequence statistics")
+    args = parser.parse_args()
+
+    sanitise_fasta(args.input, args.output, args.residues, args.simplify_headers, args.unwrap, args.log)
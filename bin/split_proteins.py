@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Splits a protein FASTA file into chunks for the per-chunk prediction tools.
+
+    split_proteins.py proteome.faa split_<sample>                       # 250 sequences per chunk
+    split_proteins.py proteome.faa split_<sample> --residues 100000     # about 100,000 residues per chunk
+    split_proteins.py proteome.faa split_<sample> --residues 100000 --balance
+    split_proteins.py proteome.faa split_<sample> --plan --cpus 16
+
+Chunks are written as <prefix>_<n>.faa, records copied as they are. By
+default every 250 sequences start a new chunk. With --residues, the
+sequences are cut, in file order, into as many chunks of at most about that
+many residues as they need, all about the same size, so a chunk of long
+proteins holds fewer of them; each sequence also counts
+SEQUENCE_COST residues, for the work the tools do per sequence whatever
+its length (SignalP 6 only reads the first 70 residues). --balance instead
+spreads the sequences over the same number of chunks longest first, each
+to the least loaded chunk, which evens out chunk sizes when a few very
+long proteins would otherwise make one chunk much bigger than the rest;
+sequences keep their file order within a chunk, but not across chunks.
+
+--plan picks the residue budget and SignalP mode from the proteome and the
+CPUs available (see plan_chunks()). The plan - sequence and residue counts,
+chunk sizes and the SignalP mode - is written to <prefix>_plan.json.
+"""
+
+import argparse
+import heapq
+import json
+import math
+
+SEQUENCES_PER_CHUNK = 250
+SEQUENCE_COST = 70
+
+# --plan: chunks smaller than this aren't worth a task's start-up (model
+# loading for SignalP, PSORTb's start-up) and, once there are enough chunks to
+# fill the CPUs, up to CHUNK_WAVES chunks per CPU leave room to even out the
+# finish times of the last wave
+MIN_CHUNK_RESIDUES = 50000
+CHUNK_WAVES = 4
+
+def read_records(input_file):
+    """(start, end, residues) of every FASTA record, as byte offsets; anything before the first header is skipped."""
+    records = []
+    start = None
+    residues = 0
+    position = 0
+    with open(input_file, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                if start is not None:
+                    records.append((start, position, residues))
+                start = position
+                residues = 0
+            elif start is not None:
+                residues += len(line.strip())
+            position += len(line)
+    if start is not None:
+        records.append((start, position, residues))
+    return records
+
+def record_cost(record):
+    return record[2] + SEQUENCE_COST
+
+def pack_sequences(records, sequences_per_chunk=SEQUENCES_PER_CHUNK):
+    return [list(range(i, min(i + sequences_per_chunk, len(records)))) for i in range(0, len(records), sequences_per_chunk)]
+
+def pack_residues(records, n_chunks):
+    """Cuts the records, in file order, into n_chunks runs of about the same cost.
+
+    Each record goes to the chunk its midpoint falls in, so no chunk is left
+    with just the remainder.
+    """
+    total = sum(record_cost(record) for record in records)
+    chunks = [[] for _ in range(max(1, n_chunks))]
+    done = 0
+    for i, record in enumerate(records):
+        cost = record_cost(record)
+        chunks[min(len(chunks) - 1, int((done + cost / 2) * len(chunks) / total))].append(i)
+        done += cost
+    return [chunk for chunk in chunks if chunk]
+
+def pack_balanced(records, n_chunks):
+    """Longest-first greedy bin packing into n_chunks chunks, each sequence going to the least loaded chunk."""
+    n_chunks = max(1, min(n_chunks, len(records)))
+    heap = [(0, c) for c in range(n_chunks)]
+    chunks = [[] for _ in range(n_chunks)]
+    for i in sorted(range(len(records)), key=lambda i: record_cost(records[i]), reverse=True):
+        load, c = heapq.heappop(heap)
+        chunks[c].append(i)
+        heapq.heappush(heap, (load + record_cost(records[i]), c))
+    return [sorted(chunk) for chunk in chunks if chunk]
+
+def plan_chunks(records, cpus):
+    """The number of chunks and SignalP mode for a proteome, given the CPUs available to the run.
+
+    A proteome too small to give every CPU a chunk of MIN_CHUNK_RESIDUES is cut
+    into as many such chunks as it fills, and SignalP runs in 'slow' mode,
+    which runs its models side by side within the task. Otherwise the chunks
+    alone keep the CPUs busy: up to CHUNK_WAVES chunks per CPU, and SignalP
+    runs in 'slow-sequential' mode, one model at a time, using less memory.
+    Both modes make the same predictions.
+    """
+    n_chunks = max(1, math.ceil(sum(record_cost(record) for record in records) / MIN_CHUNK_RESIDUES))
+    if n_chunks < cpus:
+        return n_chunks, "slow"
+    return min(n_chunks, cpus * CHUNK_WAVES), "slow-sequential"
+
+def write_chunks(input_file, prefix, records, chunks):
+    with open(input_file, "rb") as f:
+        for n, chunk in enumerate(chunks):
+            with open(f"{prefix}_{n}.faa", "wb") as out:
+                for i in chunk:
+                    start, end, _ = records[i]
+                    f.seek(start)
+                    data = f.read(end - start)
+                    out.write(data if data.endswith(b"\n") else data + b"\n")
+
+def split_proteins(input_file, prefix, residues=0, balance=False, plan=False, cpus=1):
+    records = read_records(input_file)
+    total = sum(record_cost(record) for record in records)
+    signalp_mode = None
+    if plan:
+        n_chunks, signalp_mode = plan_chunks(records, cpus)
+        residues = math.ceil(total / n_chunks)
+    elif residues:
+        n_chunks = math.ceil(total / residues)
+
+    if not records:
+        chunks = []
+    elif residues and balance:
+        chunks = pack_balanced(records, n_chunks)
+    elif residues:
+        chunks = pack_residues(records, n_chunks)
+    else:
+        chunks = pack_sequences(records)
+    write_chunks(input_file, prefix, records, chunks)
+
+    loads = [sum(record_cost(records[i]) for i in chunk) for chunk in chunks]
+    summary = {
+        "sequences": len(records),
+        "residues": sum(record[2] for record in records),
+        "chunks": len(chunks),
+        "residue_budget": residues or None,
+        "balanced": bool(residues and balance),
+        "chunk_sequences": [len(chunk) for chunk in chunks],
+        "chunk_cost": loads,
+        "signalp_mode": signalp_mode,
+    }
+    with open(f"{prefix}_plan.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Generated {len(chunks)} split fasta files from {len(records)} sequences")
+    if loads:
+        print(f"Chunk cost (residues + {SEQUENCE_COST} per sequence): min {min(loads)}, max {max(loads)}, "
+              f"mean {sum(loads) / len(loads):.0f}")
+    if signalp_mode:
+        print(f"SignalP mode: {signalp_mode}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_file", help="protein FASTA file")
+    parser.add_argument("prefix", help="chunks are written as <prefix>_<n>.faa")
+    parser.add_argument("--residues", type=int, default=0, help="residue budget per chunk (default: 250 sequences per chunk)")
+    parser.add_argument("--balance", action="store_true", help="bin-pack the sequences into evenly sized chunks instead of filling them in file order")
+    parser.add_argument("--plan", action="store_true", help="choose the residue budget and SignalP mode from the proteome and --cpus")
+    parser.add_argument("--cpus", type=int, default=1, help="CPUs available to the run, for --plan")
+    args = parser.parse_args()
+    if args.balance and not (args.residues or args.plan):
+        parser.error("--balance needs --residues or --plan")
+
+    split_proteins(args.input_file, args.prefix, args.residues, args.balance, args.plan, args.cpus)
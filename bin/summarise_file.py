@@ -1,13 +1,59 @@
 #!/usr/bin/env python
+"""Counts, per protein, the SignalP per-residue probabilities above 0.50 in each column.
 
+    summarise_file.py S1 S1_signalp_residues S1_chunk*/output_*_plot.txt --processes 4
+
+This is a standalone tool: no module runs it, as SIGNALP_SIGNALP runs with
+--format txt and writes no per-residue files. The files are parsed in a
+process pool, by default as large as the CPUs this process may run on; on a
+shared host or under a scheduler, give --processes the CPUs you were given.
+--store also keeps every protein's probabilities, for ProbabilityStore.
+"""
+
+import argparse
+import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-def process_signal_peptides(meta_id, input_file):
+# With --store, every protein's per-residue probabilities are also written to
+# <output_name>_probabilities.bin, one (residues x columns) block after the
+# other, with a JSON index of where each protein's block starts. Load it with
+# ProbabilityStore to get any protein's curves without parsing the text files.
+STORE_DTYPES = ["float16", "float32"]
+
+class ProbabilityStore:
+    """Memory-mapped per-residue probabilities; store[protein_id] is a (residues, columns) array."""
+
+    def __init__(self, output_name):
+        with open(f"{output_name}_probabilities.json") as f:
+            index = json.load(f)
+        self.columns = index["columns"]
+        self.proteins = index["proteins"]
+        shape = (index["rows"], len(self.columns))
+        if index["rows"]:
+            self.values = np.memmap(f"{output_name}_probabilities.bin", dtype=index["dtype"], mode="r", shape=shape)
+        else:
+            self.values = np.empty(shape, dtype=index["dtype"])
+
+    def __contains__(self, protein_id):
+        return protein_id in self.proteins
+
+    def __getitem__(self, protein_id):
+        offset, length = self.proteins[protein_id]
+        return self.values[offset:offset + length]
+
+def read_probabilities(input_file):
+    """The protein ID and name, probability column names and (residues x columns) probabilities in one SignalP per-residue output."""
     protein_id = None
     protein_name = None
     header_line = None
-    data_lines = []
+    has_data = False
+    # Only the probability columns are kept, as text, until they are parsed in one go
+    probabilities = []
 
     # Read the file
     with open(input_file, 'r') as f:
@@ -20,34 +66,75 @@ def process_signal_peptides(meta_id, input_file):
             elif line.startswith("# pos"):
                 header_line = line.strip().split("\t")
             elif not line.startswith("#"):
-                data_lines.append(line.strip().split("\t"))
+                has_data = True
+                fields = line.strip().split("\t", 3)
+                if len(fields) == 4:
+                    probabilities.append(fields[3])
 
-    if not header_line or not data_lines:
-        print(f"Error: No valid data found in the input file: {input_file}", file=sys.stderr)
+    if not header_line or not has_data:
         return None
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data_lines, columns=header_line, dtype=str)
+    # Parse the probability columns straight into a float matrix
+    columns = header_line[3:]
+    values = np.fromstring("\t".join(probabilities), sep="\t") if probabilities else np.empty(0)
+    if values.size != len(probabilities) * len(columns):
+        raise ValueError(f"{input_file}: expected {len(columns)} probabilities on every line")
+
+    return protein_id, protein_name, columns, values.reshape(len(probabilities), len(columns))
+
+def process_signal_peptides(meta_id, input_file, store_dtype=None):
+    """Counts the positions with a probability above 0.50, per column, in one SignalP per-residue output.
 
-    # Convert numeric columns to float
-    df.iloc[:, 3:] = df.iloc[:, 3:].astype(float)
+    With store_dtype, the probabilities are returned too, converted to that dtype.
+    """
+    probabilities = read_probabilities(input_file)
+    if probabilities is None:
+        return None
+    protein_id, protein_name, columns, values = probabilities
+    counts = (values > 0.50).sum(axis=0)
 
-    # Count values greater than 0.50 per column (excluding first 3 columns)
-    counts = (df.iloc[:, 3:] > 0.50).sum()
+    result = [meta_id, protein_id, protein_name] + counts.tolist()
+    if store_dtype:
+        return result, columns, values.astype(store_dtype)
+    return result, columns
 
-    # Return the result as a list
-    return [meta_id, protein_id, protein_name] + list(counts), df.columns[3:].to_list()  # Explicitly convert columns to list
+def summarise(args):
+    return process_signal_peptides(*args)
 
-def process_multiple_files(meta_id, output_name, input_files):
+def process_multiple_files(meta_id, output_name, input_files, processes=None, store_dtype=None):
     all_results = []
     column_names = None
+    store = open(f"{output_name}_probabilities.bin", "wb") if store_dtype else None
+    index = {}
+    rows = 0
 
-    for input_file in input_files:
-        result, columns = process_signal_peptides(meta_id, input_file)
-        if result:
+    if not processes:
+        processes = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        chunksize = max(1, len(input_files) // (processes * 4))
+        results = pool.map(summarise, [(meta_id, input_file, store_dtype) for input_file in input_files], chunksize=chunksize)
+        for input_file, summary in zip(input_files, results):
+            if summary is None:
+                print(f"Error: No valid data found in the input file: {input_file}", file=sys.stderr)
+                continue
+            result, columns = summary[:2]
             all_results.append(result)
             if column_names is None:  # Only set column names if it's not set
                 column_names = columns
+            if store:
+                if columns != column_names:
+                    print(f"Error: {input_file} has different columns from the first file; not added to the store", file=sys.stderr)
+                    continue
+                values = summary[2]
+                values.tofile(store)
+                index[result[1]] = [rows, len(values)]
+                rows += len(values)
+
+    if store:
+        store.close()
+        with open(f"{output_name}_probabilities.json", "w") as f:
+            json.dump({"dtype": store_dtype, "columns": column_names or [], "rows": rows, "proteins": index}, f)
+        print(f"Stored {rows} residues of {len(index)} proteins in {output_name}_probabilities.bin ({store_dtype})")
 
     if all_results and column_names:
         # Prepare the header dynamically based on the first file's columns
@@ -60,12 +147,14 @@ def process_multiple_files(meta_id, output_name, input_files):
         print("Error: No valid results or column names found.", file=sys.stderr)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python process_signalp.py <meta_id> <file1.txt> <file2.txt> ...", file=sys.stderr)
-        sys.exit(1)
-
-    meta_id = sys.argv[1]
-    output_name = sys.argv[2]
-    input_files = sys.argv[3:]
+    parser = argparse.ArgumentParser(description="Count SignalP per-residue probabilities above 0.50 per protein.")
+    parser.add_argument("meta_id")
+    parser.add_argument("output_name", help="output CSV name, without the .csv extension")
+    parser.add_argument("input_files", nargs="+", help="SignalP per-residue output files")
+    parser.add_argument("--processes", type=int, help="worker processes (default: the CPUs available)")
+    parser.add_argument("--store", action="store_true", help="also write the probabilities to a memory-mappable <output_name>_probabilities.bin")
+    parser.add_argument("--store-dtype", choices=STORE_DTYPES, default="float16", help="precision of the stored probabilities")
+    args = parser.parse_args()
 
-    process_multiple_files(meta_id, output_name, input_files)
+    process_multiple_files(args.meta_id, args.output_name, args.input_files, args.processes,
+                           args.store_dtype if args.store else None)
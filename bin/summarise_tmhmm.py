@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+def format_count(value):
+    # awk prints whole numbers as integers and anything else with %.6g
+    return str(int(value)) if value.is_integer() else "%.6g" % value
+
+def summarise_protein(summary_file):
+    """Counts the TM helices in one TMHMM .summary file and the residues they cover within the first 60."""
+    pred_hel = 0
+    tm_60 = 0.0
+    with open(summary_file, 'r') as f:
+        for line in f:
+            if "transmembrane helix" in line:
+                pred_hel += 1
+            fields = line.split()
+            if len(fields) >= 4 and fields[2] == "transmembrane" and fields[3] == "helix":
+                try:
+                    start = float(fields[0])
+                    end = float(fields[1])
+                except ValueError:
+                    continue
+                if start < 60:
+                    end = min(end, 60)
+                    tm_60 += end - start + 1
+    return pred_hel, tm_60
+
+def summary_files(paths):
+    """Expands directories to the *.summary files in them, in the order a shell glob lists them."""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(entry.name for entry in os.scandir(path) if entry.name.endswith(".summary") and entry.is_file())
+            for name in names:
+                yield os.path.join(path, name)
+        else:
+            yield path
+
+def write_summary(output_file, paths):
+    n_proteins = 0
+    with open(output_file, 'w') as out:
+        out.write("protein_ID\tPredHel\tTM_60\n")
+        for summary_file in summary_files(paths):
+            protein_id = os.path.basename(summary_file)
+            if protein_id.endswith(".summary"):
+                protein_id = protein_id[:-len(".summary")]
+            pred_hel, tm_60 = summarise_protein(summary_file)
+            out.write(f"{protein_id}\t{pred_hel}\t{format_count(tm_60)}\n")
+            n_proteins += 1
+    print(f"Summarised {n_proteins} TMHMM summary files into {output_file}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: summarise_tmhmm.py <output.tsv> <summary_dir_or_files> ...", file=sys.stderr)
+        sys.exit(1)
+
+    write_summary(sys.argv[1], sys.argv[2:])
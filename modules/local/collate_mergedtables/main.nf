@@ -1,18 +1,19 @@
 process COLLATE_MERGEDTABLES {
-    tag "all_samples"
+    tag "$meta.id"
 
-    conda "conda-forge::pandas=1.4.3"
+    conda "conda-forge::pandas=1.4.3 conda-forge::pyarrow=8.0.0"
     container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
-        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
-        'biocontainers/pandas:1.4.3' }
+        'https://depot.galaxyproject.org/singularity/mulled-v2-3ddac2a0bed96a62f10083cc86942c16ca30a274:6a9a20e26411abe290fd9b963910627cce2f8816-0' :
+        'biocontainers/mulled-v2-3ddac2a0bed96a62f10083cc86942c16ca30a274:6a9a20e26411abe290fd9b963910627cce2f8816-0' }
 
     input:
-    path manifest
-    path mergedtables
+    tuple val(meta), path(manifest), path(mergedtables)
+    val  columnar_output
 
     output:
-    path "all_samples_mergedtable.csv", emit: csv
-    path "versions.yml"                , emit: versions
+    tuple val(meta), path("${meta.id}_mergedtable.csv")            , emit: csv
+    tuple val(meta), path("${meta.id}_mergedtable.{parquet,arrow}"), emit: columnar, optional: true
+    path "versions.yml"                                             , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -22,12 +23,13 @@ process COLLATE_MERGEDTABLES {
 
     stub:
     """
-    touch all_samples_mergedtable.csv
+    touch ${meta.id}_mergedtable.csv
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
         pandas: \$(python -c "import pkg_resources; print(pkg_resources.get_distribution('pandas').version)")
+        pyarrow: \$(python -c "import pkg_resources; print(pkg_resources.get_distribution('pyarrow').version)")
     END_VERSIONS
     """
 }
@@ -1,23 +1,265 @@
 #!/usr/bin/env python3
+import os
+import shutil
 import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+# The --columnar_output writers are shared by COLLATE_MERGEDTABLES and
+# PREDICT_LOCALIZATION in bin/columnar_output.py. Nextflow puts bin/ on the
+# task's PATH, not on the module search path.
+sys.path.insert(0, os.path.dirname(shutil.which("columnar_output.py") or ""))
+from columnar_output import arrow_schema, columnar_backend, write_partitions  # noqa: E402
+
 GRAM_MAP = {"gram-positive": "positive", "gram-negative": "negative"}
 
+# With --columnar_output the collated table is also written as a dataset
+# partitioned by sample (<prefix>_mergedtable.parquet/sample_id=<id>/part-<n>.parquet).
+COLUMNAR_OUTPUT = "${columnar_output}" == "true"
+
+
+# Sample tables are streamed CHUNK_SIZE rows at a time straight into the output,
+# so peak memory is one chunk rather than the whole cohort.
+CHUNK_SIZE = 200000
+
+# Tables are read by a pool of READ_WORKERS threads, at most READ_WORKERS ahead
+# of the one being written, with pyarrow's CSV reader when pyarrow is
+# installed. It can't read in chunks, so tables larger than STREAM_BYTES (e.g.
+# batch tables in --collate_batch_size mode) are instead streamed in
+# CHUNK_SIZE-row chunks by pandas' C reader.
+READ_WORKERS = max(1, int("${task.cpus}"))
+STREAM_BYTES = 256 * 1024 * 1024
+
+
+# Missing values are read as in pandas 1.4's read_csv() defaults, spelled out
+# so pyarrow's reader and pandas' agree whatever the pandas version.
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null",
+]
+PANDAS_NA = {"keep_default_na": False, "na_values": NA_VALUES}
+
+
+def arrow_csv():
+    try:
+        import pyarrow
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return None
+    # pyarrow also splits each file across its own thread pool; keep that within the task's CPUs.
+    pyarrow.set_cpu_count(READ_WORKERS)
+    # Read values the way pd.read_csv() does: NA_VALUES (quoted or not) are
+    # missing and only True/False spellings are booleans.
+    convert_options = pacsv.ConvertOptions(
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True,
+        true_values=["True", "TRUE", "true"],
+        false_values=["False", "FALSE", "false"],
+    )
+    return pacsv, convert_options
+
+
+ARROW_CSV = arrow_csv()
+ENGINE = "pyarrow" if ARROW_CSV else "c"
+
+
+def read_arrow(filename, index_col=None, dtype=None):
+    pacsv, convert_options = ARROW_CSV
+    table = pacsv.read_csv(filename, convert_options=convert_options)
+    df = table.to_pandas()
+    for field in table.schema:
+        # All-empty columns come back as None objects; pandas reads them as NaN floats.
+        if str(field.type) == "null":
+            df[field.name] = np.nan
+    if index_col is not None:
+        df = df.set_index(df.columns[index_col])
+    return df.astype(dtype) if dtype else df
+
+
+def read_table(filename, read_options, dtype=None):
+    """The table as a list of DataFrames, or as a chunk iterator if it's too large to read whole.
+
+    Both readers parse floats exactly (pyarrow always does, pandas with
+    float_precision="round_trip"), so a table reads the same either way and
+    batch tables written by this script read back unchanged.
+    """
+    if os.path.getsize(filename) > STREAM_BYTES:
+        return pd.read_csv(
+            filename, dtype=dtype, chunksize=CHUNK_SIZE, float_precision="round_trip", **PANDAS_NA, **read_options
+        )
+    if ARROW_CSV:
+        try:
+            return [read_arrow(filename, dtype=dtype, **read_options)]
+        except ValueError as e:
+            # e.g. quoted fields spanning several lines, which pyarrow doesn't split on
+            print(f"WARNING: pyarrow could not parse {filename} ({e}) - reading it with pandas instead")
+    return [pd.read_csv(filename, dtype=dtype, float_precision="round_trip", **PANDAS_NA, **read_options)]
+
+
+def prefetch(pool, fn, items, window=READ_WORKERS):
+    """pool.map(fn, items), but with at most `window` calls queued ahead of the consumer."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) > window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def common_dtype(a, b):
+    # The dtype pd.concat() gives two columns of the kinds read_csv produces.
+    if a == b:
+        return a
+    numeric = all(pd.api.types.is_integer_dtype(d) or pd.api.types.is_float_dtype(d) for d in (a, b))
+    return np.dtype("float64") if numeric else np.dtype(object)
+
+
+# Each table is parsed once. Its rows are spilled to a temporary directory as
+# pickled DataFrames while the dtypes of all tables are collected, and written
+# to the output from there once the dtypes are known; each spill file is
+# deleted as soon as it has been written.
+def spill_table(item):
+    """Reads one table, spilling its chunks; returns its dtypes, number of rows, spill files and whether to re-read it.
+
+    A table streamed in chunks gets one dtype per column over all of them, as
+    a single read_csv() would give. A column that is text in some chunks but
+    parsed as numbers in others (e.g. "007") then has to be read again as
+    text throughout.
+    """
+    n, filename = item
+    own, n_rows, paths, chunk_dtypes = {}, 0, [], []
+    for c, chunk in enumerate(read_table(filename, read_options)):
+        if len(chunk):
+            chunk_dtypes.append(chunk.dtypes)
+        for col, dtype in chunk.dtypes.items():
+            own[col] = common_dtype(own.get(col, dtype), dtype) if len(chunk) else own.get(col, dtype)
+        n_rows += len(chunk)
+        path = os.path.join(spill_dir, f"table_{n}_{c}.pkl")
+        chunk.to_pickle(path)
+        paths.append(path)
+    reread = any(
+        pd.api.types.is_object_dtype(own[col]) and pd.api.types.is_numeric_dtype(dtype)
+        for dtypes in chunk_dtypes
+        for col, dtype in dtypes.items()
+    )
+    return own, n_rows, paths, reread
+
+
+def spilled_chunks(paths):
+    for path in paths:
+        chunk = pd.read_pickle(path)
+        os.remove(path)
+        yield chunk
+
+
+def resolve_dtypes(file_dtypes, file_rows):
+    """Header and column dtypes of the concatenated tables.
+
+    Columns are ordered as pd.concat() would order them (first file's columns,
+    then any new ones in order of appearance). A column missing from some files
+    is filled with NaN there, so it can't stay integer or boolean.
+    """
+    header, dtypes, n_files_with = [], {}, {}
+    for own, n_rows in zip(file_dtypes, file_rows):
+        for col, dtype in own.items():
+            if col not in n_files_with:
+                header.append(col)
+                n_files_with[col] = 0
+            n_files_with[col] += 1
+            # Header-only tables hold no values, so they don't affect dtypes.
+            if n_rows:
+                dtypes[col] = common_dtype(dtypes.get(col, dtype), dtype)
+    for col in header:
+        dtype = dtypes.setdefault(col, np.dtype(object))
+        if n_files_with[col] < len(file_dtypes):
+            if pd.api.types.is_integer_dtype(dtype):
+                dtypes[col] = np.dtype("float64")
+            elif pd.api.types.is_bool_dtype(dtype):
+                dtypes[col] = np.dtype(object)
+    return header, dtypes
+
+
+backend = columnar_backend() if COLUMNAR_OUTPUT else None
+
+# The manifest either lists MERGE_TABLES outputs (sample_id, gram, filename),
+# which get sample_id and gram_stain added, or - in --collate_batch_size tree
+# mode - only the filenames of batch tables collated earlier, which already
+# carry both columns and are concatenated as they are.
 manifest = pd.read_csv("${manifest}", sep="\\t")
+if manifest.empty:
+    raise SystemExit("ERROR: the manifest lists no tables to collate")
+sample_tables = "sample_id" in manifest.columns
+output = "${meta.id}_mergedtable"
+read_options = {"index_col": 0} if sample_tables else {}
+filenames = list(manifest["filename"])
+n_bytes = sum(os.path.getsize(filename) for filename in filenames)
+pool = ThreadPoolExecutor(max_workers=READ_WORKERS)
+spill_dir = tempfile.mkdtemp(prefix="collate_spill_", dir=".")
+
+start = time.perf_counter()
+file_dtypes, file_rows, file_spills, file_reread = zip(*prefetch(pool, spill_table, enumerate(filenames)))
+header, dtypes = resolve_dtypes(file_dtypes, file_rows)
+read_seconds = time.perf_counter() - start
 
-frames = []
-for _, row in manifest.iterrows():
-    df = pd.read_csv(row["filename"], index_col=0)
-    df.insert(0, "sample_id", row["sample_id"])
-    df.insert(1, "gram_stain", GRAM_MAP.get(row["gram"], "unknown"))
-    frames.append(df)
+first_columns = list(file_dtypes[0])
+columns = ["sample_id", "gram_stain"] + header if sample_tables else header
+n_rows = 0
+n_chunks = 0
+start = time.perf_counter()
+for n, row in enumerate(manifest.to_dict("records")):
+    filename = row["filename"]
+    own_columns = list(file_dtypes[n])
+    if own_columns != first_columns:
+        missing = [col for col in first_columns if col not in own_columns]
+        extra = [col for col in own_columns if col not in first_columns]
+        difference = f"missing: {missing}, extra: {extra}" if missing or extra else "same columns, different order"
+        print(
+            f"WARNING: {filename} has a different header from {filenames[0]} "
+            f"({difference}) - columns are aligned by name and missing ones left empty"
+        )
+    if file_reread[n]:
+        for path in file_spills[n]:
+            os.remove(path)
+        chunks = read_table(filename, read_options, dtype=file_dtypes[n])
+    else:
+        chunks = spilled_chunks(file_spills[n])
+    for table in chunks:
+        for offset in range(0, max(len(table), 1), CHUNK_SIZE):
+            df = table.iloc[offset : offset + CHUNK_SIZE].copy()
+            if sample_tables:
+                df.insert(0, "sample_id", row["sample_id"])
+                df.insert(1, "gram_stain", GRAM_MAP.get(row["gram"], "unknown"))
+            df = df.reindex(columns=columns).astype({col: dtypes[col] for col in header})
+            df.to_csv(f"{output}.csv", mode="w" if n_chunks == 0 else "a", header=n_chunks == 0, index=False)
+            if backend:
+                if n_chunks == 0:
+                    schema = arrow_schema(backend[0], df.dtypes)
+                write_partitions(backend, schema, df, f"{output}.{backend[2]}", f"part-{n_chunks}")
+            n_rows += len(df)
+            n_chunks += 1
+write_seconds = time.perf_counter() - start
+pool.shutdown()
+shutil.rmtree(spill_dir)
 
-merged = pd.concat(frames, ignore_index=True)
-merged.to_csv("all_samples_mergedtable.csv", index=False)
-print(f"Collated {len(manifest)} sample tables into all_samples_mergedtable.csv ({merged.shape[0]} rows, {merged.shape[1]} cols)")
+mb = n_bytes / 1e6
+print(f"Collated {len(manifest)} tables into {output}.csv ({n_rows} rows, {len(columns)} cols)")
+print(
+    f"Read {mb:.1f} MB with the {ENGINE} engine on {READ_WORKERS} threads: "
+    f"read {mb / max(read_seconds, 1e-9):.1f} MB/s, write {mb / max(write_seconds, 1e-9):.1f} MB/s"
+)
+if backend:
+    print(f"Wrote {output}.{backend[2]} (partitioned by sample_id)")
 
 with open("versions.yml", "w") as vf:
     vf.write('"${task.process}":\\n')
     vf.write(f"    python: {sys.version.split()[0]}\\n")
     vf.write(f"    pandas: {pd.__version__}\\n")
+    if backend:
+        vf.write(f"    pyarrow: {backend[0].__version__}\\n")
@@ -0,0 +1,44 @@
+process PHOBIUS_CONCAT {
+    tag "$meta.id"
+
+    conda "conda-forge::pandas=1.4.3"
+    container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
+        'biocontainers/pandas:1.4.3' }
+
+    input:
+    tuple val(meta), path(longtxt)
+
+    output:
+    tuple val(meta), path("${prefix}_summary.txt"), emit: txt
+    tuple val(meta), path("${prefix}_long.txt")   , emit: txtlong
+    path "versions.yml"                           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    // The chunks come in SPLIT_PROTEINS order
+    """
+    cat ${longtxt} > ${prefix}_long.txt
+    phobius_short.py ${prefix}_long.txt ${prefix}_summary.txt
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+
+    stub:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    touch ${prefix}_summary.txt
+    touch ${prefix}_long.txt
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
@@ -8,8 +8,8 @@ process PHOBIUS {
     tuple val(meta), path(faa)
 
     output:
-    tuple val(meta), path("*_summary.txt")   , emit: txt
     tuple val(meta), path("*_long.txt")      , emit: txtlong
+    tuple val(meta), val("${task.container ?: ''}"), emit: container
     path "versions.yml"                      , emit: versions
 
     when:
@@ -18,7 +18,7 @@ process PHOBIUS {
     script:
     prefix   = task.ext.prefix ?: "${faa.baseName}"
     """
-    phobius ${faa} -short > ${prefix}_summary.txt
+    # The short-format summary is derived from this by PHOBIUS_CONCAT (phobius_short.py)
     phobius ${faa} -long > ${prefix}_long.txt
 
     cat <<-END_VERSIONS > versions.yml
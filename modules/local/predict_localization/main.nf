@@ -1,19 +1,21 @@
 process PREDICT_LOCALIZATION {
     tag "predict_localization"
 
-    conda "conda-forge::pandas=1.4.3"
+    conda "conda-forge::pandas=1.4.3 conda-forge::pyarrow=8.0.0"
     container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
-        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
-        'biocontainers/pandas:1.4.3' }
+        'https://depot.galaxyproject.org/singularity/mulled-v2-3ddac2a0bed96a62f10083cc86942c16ca30a274:6a9a20e26411abe290fd9b963910627cce2f8816-0' :
+        'biocontainers/mulled-v2-3ddac2a0bed96a62f10083cc86942c16ca30a274:6a9a20e26411abe290fd9b963910627cce2f8816-0' }
 
     input:
     path mergedtable
+    val  columnar_output
 
     output:
-    path "localization.csv"         , emit: csv
-    path "localization_full.csv"    , emit: full_csv
-    path "localization_report*.html", emit: report
-    path "versions.yml"             , emit: versions
+    path "localization.csv"             , emit: csv
+    path "localization_full.csv"        , emit: full_csv
+    path "localization_report*.html"    , emit: report
+    path "localization*.{parquet,arrow}", emit: columnar, optional: true
+    path "versions.yml"                 , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -29,6 +31,7 @@ process PREDICT_LOCALIZATION {
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
         pandas: \$(python -c "import pkg_resources; print(pkg_resources.get_distribution('pandas').version)")
+        pyarrow: \$(python -c "import pkg_resources; print(pkg_resources.get_distribution('pyarrow').version)")
     END_VERSIONS
     """
 }
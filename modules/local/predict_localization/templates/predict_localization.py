@@ -1,23 +1,42 @@
 #!/usr/bin/env python3
+import base64
 import html
 import json
+import multiprocessing
+import os
 import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timezone
+from itertools import repeat
 
+import numpy as np
 import pandas as pd
 
+# The --columnar_output writers are shared by COLLATE_MERGEDTABLES and
+# PREDICT_LOCALIZATION in bin/columnar_output.py. Nextflow puts bin/ on the
+# task's PATH, not on the module search path.
+sys.path.insert(0, os.path.dirname(shutil.which("columnar_output.py") or ""))
+from columnar_output import arrow_schema, columnar_backend, write_partitions  # noqa: E402
+
 # ---------------------------------------------------------------------------
 # Consensus localization call from SignalP / TMHMM / Phobius / PSORTb + Gram stain
 # ---------------------------------------------------------------------------
 
+SIGNAL_SUBTYPES = [
+    ("Sec/SPI (general secretory)", "sign_sp_spI"),
+    ("Lipoprotein (SPII)", "sign_lipo_spII"),
+    ("Tat/SPI (folded-protein export)", "sign_tat_spI"),
+    ("Tat lipoprotein (SPII)", "sign_tatlipo_spII"),
+    ("Pilin-like (SPIII)", "sign_pilin_spIII"),
+]
+
+
 def signal_subtype(row):
-    probs = {
-        "Sec/SPI (general secretory)": row.get("sign_sp_spI", 0),
-        "Lipoprotein (SPII)": row.get("sign_lipo_spII", 0),
-        "Tat/SPI (folded-protein export)": row.get("sign_tat_spI", 0),
-        "Tat lipoprotein (SPII)": row.get("sign_tatlipo_spII", 0),
-        "Pilin-like (SPIII)": row.get("sign_pilin_spIII", 0),
-    }
+    probs = {label: row.get(col, 0) for label, col in SIGNAL_SUBTYPES}
     return max(probs, key=probs.get)
 
 
@@ -180,6 +199,293 @@ def classify(row):
     return loc, conf, "; ".join(notes)
 
 
+# ---------------------------------------------------------------------------
+# Columnar classification engine
+#
+# classify() above is the readable, row-at-a-time reference (and what
+# docs/localization-logic.md describes). classify_frame() evaluates the same
+# decision tree as boolean masks over whole columns, which is what the
+# pipeline actually runs - it must stay byte-identical to classify(), so any
+# rule change has to be made in both places. tests/test_predict_localization.py
+# checks both engines against classify() over every combination of the values
+# the rules branch on.
+# ---------------------------------------------------------------------------
+
+def signal_subtype_frame(df):
+    # Same tie-breaking as max() in signal_subtype(): the first subtype with the
+    # strictly highest probability wins.
+    labels = np.full(len(df), SIGNAL_SUBTYPES[0][0], dtype=object)
+    best = df[SIGNAL_SUBTYPES[0][1]].to_numpy()
+    for label, col in SIGNAL_SUBTYPES[1:]:
+        probs = df[col].to_numpy()
+        better = probs > best
+        labels[better] = label
+        best = np.where(better, probs, best)
+    return pd.Series(labels, index=df.index)
+
+
+def _append_note(notes, mask, text):
+    if not mask.any():
+        return
+    if not isinstance(text, str):
+        text = text[mask]
+    current = notes[mask]
+    notes[mask] = np.where(current == "", "", current + "; ") + text
+
+
+def classify_frame(df):
+    # Plain object arrays rather than Series: no index alignment, and NaN simply
+    # compares unequal to every string, just like the scalar checks in classify().
+    sp = df["sign_prediction"].to_numpy(dtype=object)
+    phsp = df["phob_SP"].to_numpy(dtype=object)
+    predhel = df["PredHel"].to_numpy()
+    phtm = df["phob_TM"].to_numpy()
+    psort = df["psort_prediction"].to_numpy(dtype=object)
+    pscore = df["psort_score"].to_numpy()
+    gram = df["gram_stain"].to_numpy(dtype=object)
+    cs_prob = df["cs_prob"].to_numpy()
+
+    # str() of each value, exactly as the f-strings in classify() render them
+    predhel_s = df["PredHel"].map(str).to_numpy(dtype=object)
+    phtm_s = df["phob_TM"].map(str).to_numpy(dtype=object)
+    psort_s = df["psort_prediction"].map(str).to_numpy(dtype=object)
+    pscore_s = df["psort_score"].map(str).to_numpy(dtype=object)
+    tm_count_s = np.where(phtm > predhel, phtm_s, predhel_s)  # max(predhel, phtm)
+
+    has_psort = pd.notna(psort)
+    score_high = pscore >= 9
+    is_extracellular = psort == "Extracellular"
+    is_periplasmic = psort == "Periplasmic"
+    is_cyto_membrane = psort == "CytoplasmicMembrane"
+    is_cytoplasmic = psort == "Cytoplasmic"
+
+    is_lipo = sp == "LIPO"
+    has_sp_call = (sp == "SP") | is_lipo
+    sp_disagree = has_sp_call & (phsp == "0")
+    low_cs = has_sp_call & pd.notna(cs_prob) & (cs_prob < 0.7)
+
+    is_outer = psort == "OuterMembrane"
+    outer_mismatch = is_outer & (gram == "positive")
+    outer = is_outer & ~(gram == "positive")
+
+    tmhmm_multi = predhel >= 2
+    phobius_multi = phtm >= 2
+    multi = ~outer & tmhmm_multi & phobius_multi
+    single_tool = ~outer & (tmhmm_multi != phobius_multi)
+    single_pass = ~outer & ~multi & ~single_tool & (predhel == 1) & (phtm == 1)
+    fallthrough = ~(outer | multi | single_tool | single_pass)
+    tmhmm_only = fallthrough & (predhel == 1) & (phtm == 0)
+
+    secreted = fallthrough & has_sp_call
+    sec_negative = secreted & (gram == "negative")
+    sec_positive = secreted & (gram == "positive")
+    sec_unknown = secreted & ~(sec_negative | sec_positive)
+    not_secreted = fallthrough & ~has_sp_call
+
+    source = np.where(tmhmm_multi, "TMHMM", "Phobius").astype(object)
+    other = np.where(tmhmm_multi, "Phobius", "TMHMM").astype(object)
+
+    loc = np.select(
+        [
+            outer,
+            multi,
+            single_tool,
+            single_pass,
+            sec_negative & is_extracellular,
+            (sec_negative | sec_positive) & is_cyto_membrane,
+            sec_negative & is_lipo,
+            sec_negative,
+            sec_positive & is_lipo,
+            sec_positive,
+            sec_unknown,
+            not_secreted & is_extracellular,
+            not_secreted & is_cyto_membrane,
+        ],
+        [
+            "Outer membrane protein (beta-barrel, PSORTb-supported)",
+            "Integral membrane protein (multi-pass, ~" + tm_count_s + " TM helices)",
+            "TM helices predicted by " + source + " only (~" + tm_count_s + ") - needs review",
+            "Membrane-anchored (signal-anchor / single-pass TM)",
+            "Extracellular (Sec-secreted, exported beyond periplasm)",
+            "Membrane-associated (PSORTb: cytoplasmic membrane)",
+            "Periplasmic (lipoprotein, membrane-anchored)",
+            "Periplasmic (Sec-dependent; may be further exported)",
+            "Cell-surface anchored lipoprotein",
+            "Extracellular (Sec-secreted)",
+            "Putative secreted/exported (Gram stain unknown)",
+            "Possible non-classical secretion",
+            "Ambiguous (no SP/TM detected, but PSORTb: cytoplasmic membrane)",
+        ],
+        default="Cytoplasmic",
+    )
+
+    high_or_moderate = np.where(score_high, "High", "Moderate")
+    conf = np.select(
+        [
+            outer,
+            multi | single_pass,
+            single_tool | sec_unknown,
+            sec_negative & (is_extracellular | is_periplasmic),
+            sec_positive & is_extracellular,
+            not_secreted & (is_extracellular | is_cyto_membrane),
+            not_secreted & is_cytoplasmic,
+            not_secreted & has_psort,
+        ],
+        [
+            np.where(score_high, "High", np.where(pscore >= 7, "Moderate", "Low")),
+            "High",
+            "Low",
+            high_or_moderate,
+            high_or_moderate,
+            "Low",
+            high_or_moderate,
+            "Low",
+        ],
+        default="Moderate",
+    )
+    conf[secreted & (sp_disagree | tmhmm_only) & (conf == "High")] = "Moderate"
+
+    subtype = signal_subtype_frame(df).to_numpy(dtype=object)
+    cs_prob_s = np.full(len(df), "", dtype=object)
+    cs_prob_s[low_cs] = ["{:.2f}".format(value) for value in cs_prob[low_cs]]
+    psort_note = "PSORTb: " + psort_s + " (score " + pscore_s + ")"
+    notes = np.full(len(df), "", dtype=object)
+
+    _append_note(notes, sp_disagree, (
+        "SignalP predicts a cleavable signal peptide but Phobius does not "
+        "(Phobius instead calls a TM helix) - signal-peptide-vs-signal-anchor disagreement"
+    ))
+    _append_note(notes, low_cs, (
+        "SignalP cleavage-site confidence is low (Pr=" + cs_prob_s
+        + ") - signal peptide call is uncertain"
+    ))
+    _append_note(notes, outer_mismatch, (
+        "PSORTb predicts outer membrane, but this sample is marked Gram-positive - a Gram-positive "
+        "cell has no outer membrane, so this call is likely a Gram-stain mismatch or a PSORTb model "
+        "error and is not trusted here; falling back to the signal-peptide/TM-based logic below"
+    ))
+    _append_note(notes, outer, (
+        "PSORTb predicts outer membrane (score " + pscore_s + ") using its dedicated beta-barrel/composition-based "
+        "detector for Gram-negative bacteria. TMHMM and Phobius only model alpha-helical transmembrane "
+        "segments and have no beta-barrel mode, so they are expected to disagree or produce nonsensical "
+        "helix counts here (TMHMM " + predhel_s + ", Phobius " + phtm_s + ") - those counts are not used for this call"
+    ))
+    _append_note(notes, outer & has_sp_call, "Signal peptide type: " + subtype)
+
+    _append_note(notes, multi & (predhel != phtm), (
+        "TMHMM predicts " + predhel_s + " TM helices vs Phobius " + phtm_s
+        + " - both agree on multi-pass, exact count differs"
+    ))
+    _append_note(notes, multi & has_psort & ~is_cyto_membrane, (
+        'PSORTb calls "' + psort_s + '" (score ' + pscore_s + "), conflicting with multi-pass TM prediction"
+    ))
+    _append_note(notes, multi & is_cyto_membrane, "PSORTb agrees: cytoplasmic membrane (score " + pscore_s + ")")
+
+    _append_note(notes, single_tool, (
+        "TMHMM calls " + predhel_s + " TM helices, Phobius calls " + phtm_s + " - only " + source
+        + " supports a multi-pass membrane topology and " + other + " does not. TMHMM is known to over-call "
+        "helices on hydrophobic or low-complexity/coiled-coil regions, so a single-tool call is not trusted "
+        "as multi-pass without independent agreement"
+    ))
+    _append_note(notes, single_tool & has_psort, psort_note)
+
+    _append_note(notes, single_pass, (
+        "TMHMM and Phobius agree on one TM helix - likely a genuine (uncleaved) signal-anchor; "
+        "protein probably stays membrane-bound rather than being released"
+    ))
+    _append_note(notes, single_pass & has_psort, psort_note)
+
+    _append_note(notes, tmhmm_only, (
+        "TMHMM calls one N-terminal TM helix, but Phobius (which jointly models signal peptides "
+        "and TM helices) does not - likely TMHMM is picking up the signal peptide's hydrophobic "
+        "core rather than a genuine anchor"
+    ))
+
+    _append_note(notes, sec_negative & is_extracellular, (
+        "PSORTb supports export beyond the periplasm (score " + pscore_s + ")"
+    ))
+    _append_note(notes, sec_negative & is_periplasmic, "PSORTb agrees: periplasmic (score " + pscore_s + ")")
+    _append_note(notes, sec_negative & is_cyto_membrane, (
+        "PSORTb suggests membrane retention despite a cleavable signal peptide (score " + pscore_s + ")"
+    ))
+    _append_note(
+        notes,
+        sec_negative & has_psort & ~(is_extracellular | is_periplasmic | is_cyto_membrane),
+        psort_note + " - conflicts with default periplasmic assignment",
+    )
+    _append_note(notes, sec_positive, (
+        "Gram-positive: no periplasm, so a cleaved signal peptide with no TM usually means full "
+        "secretion; cell-wall-anchoring motifs (e.g. LPXTG) are not evaluated here"
+    ))
+    _append_note(notes, sec_positive & is_extracellular, "PSORTb agrees: extracellular (score " + pscore_s + ")")
+    _append_note(notes, sec_positive & is_cyto_membrane, "PSORTb suggests membrane retention (score " + pscore_s + ")")
+    _append_note(notes, sec_positive & is_periplasmic, (
+        "PSORTb calls periplasmic (score " + pscore_s + "), unusual for Gram-positive"
+    ))
+    _append_note(notes, sec_unknown, (
+        "Gram stain of this taxon is unknown, so localization cannot be confidently assigned"
+    ))
+    _append_note(notes, sec_unknown & has_psort, psort_note)
+    _append_note(notes, secreted, "Signal peptide type: " + subtype)
+
+    _append_note(notes, not_secreted & is_extracellular, (
+        "No signal peptide detected by SignalP/Phobius, but PSORTb predicts extracellular "
+        "(score " + pscore_s + ") - could reflect non-classical secretion, a moonlighting protein, or a false positive"
+    ))
+    _append_note(notes, not_secreted & is_cyto_membrane, (
+        "PSORTb calls cytoplasmic membrane (score " + pscore_s + ") despite no signal peptide or TM helix"
+    ))
+    _append_note(notes, not_secreted & is_cytoplasmic, "PSORTb agrees: cytoplasmic (score " + pscore_s + ")")
+    _append_note(
+        notes,
+        not_secreted & has_psort & ~(is_extracellular | is_cyto_membrane | is_cytoplasmic),
+        psort_note,
+    )
+
+    return pd.DataFrame(
+        {
+            "predicted_localization": pd.Series(loc, index=df.index, dtype=object),
+            "localization_confidence": pd.Series(conf, index=df.index, dtype=object),
+            "rationale_notes": pd.Series(notes, index=df.index, dtype=object),
+        }
+    )
+
+
+# ---------------------------------------------------------------------------
+# Dedup-and-broadcast: classify each distinct feature combination once
+#
+# The call depends only on a handful of columns, and most of a proteome (no
+# signal peptide, no TM helix, same PSORTb call) shares the same values. The
+# key is normalised to what classify() actually reads: the SignalP class
+# probabilities only matter through the winning subtype, and cs_prob only
+# through the "low cleavage-site confidence" note, and both only when SignalP
+# calls a signal peptide.
+# ---------------------------------------------------------------------------
+
+MEMO_KEY_COLUMNS = [
+    "sign_prediction", "phob_SP", "PredHel", "phob_TM",
+    "psort_prediction", "psort_score", "gram_stain",
+]
+
+
+def memo_key_frame(df):
+    has_sp_call = df["sign_prediction"].isin(["SP", "LIPO"])
+    low_cs = has_sp_call & (df["cs_prob"] < 0.7)
+    key = df[MEMO_KEY_COLUMNS].copy()
+    key["signal_subtype"] = signal_subtype_frame(df).where(has_sp_call)
+    key["cs_prob_note"] = df.loc[low_cs, "cs_prob"].map("{:.2f}".format).reindex(df.index)
+    return key
+
+
+def classify_memoized(df):
+    key = memo_key_frame(df)
+    first = ~key.duplicated()
+    calls = pd.concat([key[first], classify_frame(df[first])], axis=1)
+    results = key.merge(calls, on=list(key.columns), how="left")
+    results.index = df.index
+    return results[["predicted_localization", "localization_confidence", "rationale_notes"]], int(first.sum())
+
+
 REVIEW_BUCKET = "TM helices - single tool only (needs review)"
 UNKNOWN_BUCKET = "Unknown / unclassified"
 
@@ -230,9 +536,7 @@ def build_webapp_table(df):
     out["gram_stain"] = df["gram_stain"]
 
     out["signalp_call"] = df["sign_prediction"]
-    out["signalp_type"] = df.apply(
-        lambda r: signal_subtype(r) if r["sign_prediction"] in ("SP", "LIPO") else "-", axis=1
-    )
+    out["signalp_type"] = signal_subtype_frame(df).where(df["sign_prediction"].isin(["SP", "LIPO"]), "-")
     out["signalp_confidence"] = df["cs_prob"].round(3)
 
     out["tmhmm_tm_helices"] = df["PredHel"]
@@ -253,43 +557,61 @@ def build_webapp_table(df):
 # Run classification
 # ---------------------------------------------------------------------------
 
-df = pd.read_csv("${mergedtable}")
+# The merged table is processed CHUNK_SIZE rows at a time: each chunk is
+# classified, appended to localization.csv / localization_full.csv, and its
+# report rows are spilled to disk per sample, so peak memory follows the chunk
+# size rather than the size of the cohort.
+CHUNK_SIZE = 200000
 
-required_cols = {
+REQUIRED_COLUMNS = {
     "sample_id", "gram_stain", "tax_id", "protein_id", "protein_name",
     "sign_prediction", "sign_other", "sign_sp_spI", "sign_lipo_spII",
     "sign_tat_spI", "sign_tatlipo_spII", "sign_pilin_spIII", "sign_cspos",
     "PredHel", "phob_TM", "phob_SP", "psort_prediction", "psort_score",
 }
-missing = required_cols - set(df.columns)
-if missing:
-    raise SystemExit(f"ERROR: input table is missing expected columns: {sorted(missing)}")
+MEMBRANE_BUCKETS = {"Integral membrane (multi-pass)", "Membrane-anchored (single-pass)"}
 
-df["cs_prob"] = df["sign_cspos"].str.extract(r"Pr:\\s*([\\d.]+)").astype(float)
+# Every report chart and stat tile is a sum over this aggregate (plus the
+# distinct sample/species pairs for the species tile), built once while the
+# chunks stream through, so no report has to rescan protein rows for them.
+REPORT_COUNT_KEYS = ["sample_id", "locus_bucket", "localization_confidence", "gram_stain"]
+
+
+def read_chunks(path, **kwargs):
+    """The table in CHUNK_SIZE-row chunks - at least one, so a table with only a header still gives its columns."""
+    n_chunks = 0
+    for n_chunks, chunk in enumerate(pd.read_csv(path, chunksize=CHUNK_SIZE, **kwargs), start=1):
+        yield chunk
+    if not n_chunks:
+        yield pd.read_csv(path, nrows=0, **kwargs)
+
+
+def scan_dtypes(path):
+    # pandas infers dtypes per chunk, so e.g. PredHel would be int64 in a chunk
+    # without missing values and float64 in one with them - and render as "3" or
+    # "3.0" accordingly. Resolve one dtype per column over the whole file first,
+    # the same way a single read_csv() would.
+    dtypes = {}
+    for chunk in read_chunks(path):
+        for col, dtype in chunk.dtypes.items():
+            seen = dtypes.get(col, dtype)
+            if seen != dtype:
+                numeric = all(
+                    pd.api.types.is_integer_dtype(d) or pd.api.types.is_float_dtype(d) for d in (seen, dtype)
+                )
+                dtype = np.dtype("float64") if numeric else np.dtype(object)
+            dtypes[col] = dtype
+    return dtypes
 
-results = df.apply(classify, axis=1, result_type="expand")
-results.columns = ["predicted_localization", "localization_confidence", "rationale_notes"]
-df = pd.concat([df, results], axis=1)
-df["locus_bucket"] = df["predicted_localization"].apply(bucket)
 
-webapp_df = build_webapp_table(df)
-webapp_df.to_csv("localization.csv", index=False)
-print(f"Wrote localization.csv ({len(webapp_df)} rows, {len(webapp_df.columns)} columns)")
+# ---------------------------------------------------------------------------
+# Optional columnar output
+# ---------------------------------------------------------------------------
 
-df.drop(columns=["cs_prob", "locus_bucket"]).to_csv("localization_full.csv", index=False)
-print("Wrote localization_full.csv")
+# With --columnar_output the localization tables are also written as datasets
+# partitioned by sample (localization.parquet/sample_id=<id>/part-<n>.parquet).
+COLUMNAR_OUTPUT = "${columnar_output}" == "true"
 
-MEMBRANE_BUCKETS = {"Integral membrane (multi-pass)", "Membrane-anchored (single-pass)"}
-membrane_fraction = df["locus_bucket"].isin(MEMBRANE_BUCKETS).mean()
-if membrane_fraction > 0.4:
-    print(
-        f"WARNING: {membrane_fraction:.0%} of proteins were classified as membrane "
-        "(integral multi-pass or single-pass anchored). Real proteomes are typically "
-        "~20-30% membrane protein; a fraction this high usually means TMHMM and/or "
-        "Phobius are over-calling TM helices on this input (e.g. low-complexity or "
-        "repetitive sequence) rather than reflecting genuine biology - spot-check a "
-        "handful of these proteins' annotations before trusting the output."
-    )
 
 # ---------------------------------------------------------------------------
 # Lightweight, self-contained HTML report (no JS/CSS frameworks, no CDN calls)
@@ -433,13 +755,23 @@ h2 { font-size: 15px; margin: 0 0 12px; color: var(--ink-primary); }
 }
 .controls input { flex: 1; min-width: 220px; }
 #row-count { color: var(--ink-secondary); font-size: 12px; }
-table { width: 100%; border-collapse: collapse; font-size: 12.5px; }
+table { width: 100%; border-collapse: collapse; font-size: 12.5px; table-layout: fixed; }
 th, td {
   text-align: left;
   padding: 8px 10px;
   border-bottom: 1px solid var(--gridline);
   vertical-align: top;
 }
+td {
+  height: 34px;
+  line-height: 17px;
+  white-space: nowrap;
+  overflow: hidden;
+  text-overflow: ellipsis;
+}
+tr.spacer td { padding: 0; border: 0; }
+#protein-rows tr:not(.spacer) { cursor: pointer; }
+#protein-rows tr.selected td { background: var(--gridline); }
 th {
   color: var(--ink-secondary);
   font-weight: 600;
@@ -452,12 +784,13 @@ th {
 }
 th.sort-asc::after { content: " ↑"; }
 th.sort-desc::after { content: " ↓"; }
-td.rationale { max-width: 360px; color: var(--ink-secondary); }
+td.rationale { color: var(--ink-secondary); }
 .table-wrap { max-height: 640px; overflow: auto; border: 1px solid var(--border); border-radius: 8px; }
+.row-detail { margin-top: 12px; color: var(--ink-secondary); font-size: 13px; }
+.row-detail strong { color: var(--ink-primary); }
 """
 
 JS = """
-var DATA = JSON.parse(document.getElementById("protein-data").textContent);
 var COLUMNS = [
   ["sample_id", "Sample"],
   ["protein_id", "Protein ID"],
@@ -474,51 +807,215 @@ var COLUMNS = [
   ["rationale_notes", "Rationale"]
 ];
 
-var state = { sortKey: "predicted_localization", sortDir: 1, search: "", confidence: "All" };
+// Only the rows inside the scrolled viewport (plus a small overscan) exist in
+// the DOM; spacer rows above and below keep the scrollbar the right size. Every
+// cell is one line high (long text is ellipsised), so positions are a simple
+// multiple of ROW_HEIGHT. Clicking a row shows its full rationale below.
+var ROW_HEIGHT = 34;
+var OVERSCAN = 10;
+var SEARCH_DELAY_MS = 200;
+
+var state = { sortKey: "predicted_localization", sortDir: 1, search: "", confidence: "All", view: [], selected: -1 };
+
+// Sorting and searching use lookups precomputed by write_report() rather than
+// comparing or scanning rows here:
+//   INDEX.order[key]  row indices in ascending order of that column; descending
+//                     walks the same permutation backwards
+//   INDEX.terms[key]  distinct lowercased values of protein_name / species with
+//                     the rows holding each (CSR: offsets into a row list)
+function decodeUint(b64, width) {
+  var bin = atob(b64);
+  var bytes = new Uint8Array(bin.length);
+  for (var i = 0; i < bin.length; i++) {
+    bytes[i] = bin.charCodeAt(i);
+  }
+  return width === 1 ? bytes : width === 2 ? new Uint16Array(bytes.buffer) : new Uint32Array(bytes.buffer);
+}
 
-function renderTable() {
-  var rows = DATA.filter(function (row) {
-    if (state.confidence !== "All" && row.localization_confidence !== state.confidence) {
-      return false;
+function decodeUint32(b64) {
+  return decodeUint(b64, 4);
+}
+
+// The table arrives column by column. Low-cardinality columns are dictionary
+// encoded - their distinct values once, plus one small integer code per row -
+// and are kept that way here; cell() looks a value up without ever building
+// per-row objects.
+var PAYLOAD = JSON.parse(document.getElementById("protein-data").textContent);
+var N_ROWS = PAYLOAD.n;
+var DATA = {};
+Object.keys(PAYLOAD.columns).forEach(function (key) {
+  var col = PAYLOAD.columns[key];
+  DATA[key] = col.dict ? { dict: col.dict, codes: decodeUint(col.codes, col.width) } : { values: col.values };
+});
+
+function cell(i, key) {
+  var col = DATA[key];
+  return col.dict ? col.dict[col.codes[i]] : col.values[i];
+}
+
+var INDEX = JSON.parse(document.getElementById("report-index").textContent);
+var ORDER = {};
+Object.keys(INDEX.order).forEach(function (key) {
+  ORDER[key] = decodeUint32(INDEX.order[key]);
+});
+var TERMS = {};
+Object.keys(INDEX.terms).forEach(function (key) {
+  var term = INDEX.terms[key];
+  TERMS[key] = { values: term.values, offsets: decodeUint32(term.offsets), rows: decodeUint32(term.rows) };
+});
+
+function lowerId(i) {
+  var id = cell(i, "protein_id");
+  return String(id === null ? "" : id).toLowerCase();
+}
+
+// Every protein ID, lowercased, in one newline-separated string, with the
+// offset each row's ID starts at: an ID search is then a few native indexOf()
+// calls instead of one per row, and still matches anywhere in the ID. A
+// search can't contain a newline, so a match never spans two IDs.
+var ID_STARTS = new Uint32Array(N_ROWS + 1);
+var ID_TEXT = (function () {
+  var ids = new Array(N_ROWS);
+  var pos = 0;
+  for (var i = 0; i < N_ROWS; i++) {
+    ids[i] = lowerId(i);
+    ID_STARTS[i] = pos;
+    pos += ids[i].length + 1;
+  }
+  ID_STARTS[N_ROWS] = pos;
+  return ids.join(String.fromCharCode(10));
+})();
+
+function searchMatches(query) {
+  var match = new Uint8Array(N_ROWS);
+
+  // Protein IDs: find each occurrence in ID_TEXT, mark the row it falls in and
+  // carry on from the next row's ID.
+  var row = 0;
+  for (var pos = ID_TEXT.indexOf(query); pos !== -1; pos = ID_TEXT.indexOf(query, ID_STARTS[row + 1])) {
+    while (ID_STARTS[row + 1] <= pos) {
+      row++;
     }
-    if (state.search) {
-      var haystack = ((row.protein_id || "") + " " + (row.protein_name || "") + " " + (row.species || "")).toLowerCase();
-      if (haystack.indexOf(state.search) === -1) {
-        return false;
+    match[row] = 1;
+  }
+
+  // Names and species: substring test against each distinct value once, then
+  // mark every row holding a matching value.
+  Object.keys(TERMS).forEach(function (key) {
+    var term = TERMS[key];
+    for (var v = 0; v < term.values.length; v++) {
+      if (term.values[v].indexOf(query) === -1) {
+        continue;
+      }
+      for (var r = term.offsets[v]; r < term.offsets[v + 1]; r++) {
+        match[term.rows[r]] = 1;
       }
     }
-    return true;
   });
+  return match;
+}
 
-  rows.sort(function (a, b) {
-    var av = a[state.sortKey];
-    var bv = b[state.sortKey];
-    if (av === null || av === undefined) av = "";
-    if (bv === null || bv === undefined) bv = "";
-    if (av < bv) return -1 * state.sortDir;
-    if (av > bv) return 1 * state.sortDir;
-    return 0;
-  });
+function updateView() {
+  var order = ORDER[state.sortKey];
+  var match = state.search ? searchMatches(state.search) : null;
+  var view = [];
+  for (var n = 0; n < order.length; n++) {
+    var i = state.sortDir === 1 ? order[n] : order[order.length - 1 - n];
+    if (match && !match[i]) {
+      continue;
+    }
+    if (state.confidence !== "All" && cell(i, "localization_confidence") !== state.confidence) {
+      continue;
+    }
+    view.push(i);
+  }
 
-  var tbody = document.getElementById("protein-rows");
-  tbody.innerHTML = "";
-  rows.forEach(function (row) {
+  state.view = view;
+  document.getElementById("row-count").textContent = view.length + " of " + N_ROWS + " proteins";
+  document.getElementById("table-wrap").scrollTop = 0;
+  renderTable();
+}
+
+function spacerRow(height) {
+  var tr = document.createElement("tr");
+  tr.className = "spacer";
+  var td = document.createElement("td");
+  td.colSpan = COLUMNS.length;
+  td.style.height = height + "px";
+  tr.appendChild(td);
+  return tr;
+}
+
+function renderTable() {
+  var wrap = document.getElementById("table-wrap");
+  var total = state.view.length;
+  var first = Math.max(0, Math.floor(wrap.scrollTop / ROW_HEIGHT) - OVERSCAN);
+  var last = Math.min(total, first + Math.ceil(wrap.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN);
+
+  var fragment = document.createDocumentFragment();
+  fragment.appendChild(spacerRow(first * ROW_HEIGHT));
+  for (var i = first; i < last; i++) {
+    var index = state.view[i];
     var tr = document.createElement("tr");
+    tr.setAttribute("data-index", index);
+    if (index === state.selected) {
+      tr.className = "selected";
+    }
     COLUMNS.forEach(function (col) {
       var td = document.createElement("td");
-      var value = row[col[0]];
+      var value = cell(index, col[0]);
       td.textContent = (value === null || value === undefined || value === "") ? "-" : value;
+      td.title = td.textContent;
       if (col[0] === "rationale_notes") {
         td.className = "rationale";
       }
       tr.appendChild(td);
     });
-    tbody.appendChild(tr);
-  });
+    fragment.appendChild(tr);
+  }
+  fragment.appendChild(spacerRow((total - last) * ROW_HEIGHT));
+
+  var tbody = document.getElementById("protein-rows");
+  tbody.textContent = "";
+  tbody.appendChild(fragment);
+}
 
-  document.getElementById("row-count").textContent = rows.length + " of " + DATA.length + " proteins";
+function showDetail(index) {
+  var detail = document.getElementById("row-detail");
+  detail.textContent = "";
+  var name = document.createElement("strong");
+  var proteinName = cell(index, "protein_name");
+  name.textContent = cell(index, "protein_id") + (proteinName ? " - " + proteinName : "");
+  detail.appendChild(name);
+  detail.appendChild(document.createTextNode(
+    ": " + cell(index, "predicted_localization") + " (" + cell(index, "localization_confidence") + "). " +
+    (cell(index, "rationale_notes") || "")
+  ));
 }
 
+var scrollPending = false;
+document.getElementById("table-wrap").addEventListener("scroll", function () {
+  if (scrollPending) {
+    return;
+  }
+  scrollPending = true;
+  window.requestAnimationFrame(function () {
+    scrollPending = false;
+    renderTable();
+  });
+});
+window.addEventListener("resize", renderTable);
+
+document.getElementById("protein-rows").addEventListener("click", function (e) {
+  var tr = e.target.closest("tr[data-index]");
+  if (!tr) {
+    return;
+  }
+  state.selected = Number(tr.getAttribute("data-index"));
+  showDetail(state.selected);
+  renderTable();
+});
+
 document.querySelectorAll("th[data-key]").forEach(function (th) {
   th.addEventListener("click", function () {
     var key = th.getAttribute("data-key");
@@ -532,90 +1029,138 @@ document.querySelectorAll("th[data-key]").forEach(function (th) {
       h.classList.remove("sort-asc", "sort-desc");
     });
     th.classList.add(state.sortDir === 1 ? "sort-asc" : "sort-desc");
-    renderTable();
+    updateView();
   });
 });
 
+var searchTimer = null;
 document.getElementById("search-box").addEventListener("input", function (e) {
-  state.search = e.target.value.toLowerCase();
-  renderTable();
+  var value = e.target.value.toLowerCase();
+  window.clearTimeout(searchTimer);
+  searchTimer = window.setTimeout(function () {
+    state.search = value;
+    updateView();
+  }, SEARCH_DELAY_MS);
 });
 
 document.getElementById("confidence-filter").addEventListener("change", function (e) {
   state.confidence = e.target.value;
-  renderTable();
+  updateView();
 });
 
-renderTable();
+updateView();
 """
 
-table_header_cells = "".join(f'<th data-key="{key}">{html.escape(label)}</th>' for key, label in [
-    ("sample_id", "Sample"),
-    ("protein_id", "Protein ID"),
-    ("protein_name", "Protein"),
-    ("species", "Species"),
-    ("gram_stain", "Gram"),
-    ("signalp_call", "SignalP"),
-    ("signalp_type", "SignalP type"),
-    ("tmhmm_tm_helices", "TMHMM TM"),
-    ("phobius_tm_helices", "Phobius TM"),
-    ("psortb_localization", "PSORTb"),
-    ("predicted_localization", "Predicted localization"),
-    ("localization_confidence", "Confidence"),
-    ("rationale_notes", "Rationale"),
-])
-
-def write_report(report_df, report_webapp_df, filename, title, extra_meta=""):
-    bucket_counts = report_df["locus_bucket"].value_counts()
+TABLE_COLUMNS = [
+    ("sample_id", "Sample", 120),
+    ("protein_id", "Protein ID", 140),
+    ("protein_name", "Protein", 240),
+    ("species", "Species", 150),
+    ("gram_stain", "Gram", 90),
+    ("signalp_call", "SignalP", 90),
+    ("signalp_type", "SignalP type", 200),
+    ("tmhmm_tm_helices", "TMHMM TM", 100),
+    ("phobius_tm_helices", "Phobius TM", 100),
+    ("psortb_localization", "PSORTb", 160),
+    ("predicted_localization", "Predicted localization", 320),
+    ("localization_confidence", "Confidence", 110),
+    ("rationale_notes", "Rationale", 480),
+]
+# Fixed column widths: with only a window of rows in the DOM, auto-sized
+# columns would jump around while scrolling.
+table_width = sum(width for _, _, width in TABLE_COLUMNS)
+table_colgroup = "".join(f'<col style="width:{width}px">' for _, _, width in TABLE_COLUMNS)
+table_header_cells = "".join(
+    f'<th data-key="{key}">{html.escape(label)}</th>' for key, label, _ in TABLE_COLUMNS
+)
+
+def encode_uint32(values):
+    return base64.b64encode(np.asarray(values, dtype="<u4").tobytes()).decode("ascii")
+
+
+def encode_codes(codes, n_values):
+    width = 1 if n_values <= 0xFF else 2 if n_values <= 0xFFFF else 4
+    return width, base64.b64encode(np.asarray(codes, dtype=f"<u{width}").tobytes()).decode("ascii")
+
+
+def encode_column(col):
+    # Dictionary-encode columns with many repeats (calls, notes, samples,
+    # species...); per-protein columns such as IDs go out as a plain list.
+    # Missing values become code 0 / null.
+    codes, values = pd.factorize(col)
+    if len(values) > len(col) // 2:
+        return {"values": col.astype(object).where(col.notna(), None).tolist()}
+    width, encoded = encode_codes(codes + 1, len(values) + 1)
+    return {"dict": [None] + values.tolist(), "width": width, "codes": encoded}
+
+
+def sort_order(col):
+    # Ascending, stable, missing values first (the report shows them as "-").
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        values = col.to_numpy(dtype=float)
+        return np.argsort(np.where(np.isnan(values), -np.inf, values), kind="stable")
+    codes, _ = pd.factorize(col.where(col.notna(), "").astype(str), sort=True)
+    return np.argsort(codes, kind="stable")
+
+
+def term_postings(col):
+    codes, values = pd.factorize(col.where(col.notna(), "").astype(str).str.lower())
+    rows = np.argsort(codes, kind="stable")
+    offsets = np.searchsorted(codes[rows], np.arange(len(values) + 1))
+    return {"values": list(values), "offsets": encode_uint32(offsets), "rows": encode_uint32(rows)}
+
+
+def build_report_index(report_webapp_df):
+    webapp = report_webapp_df.reset_index(drop=True)
+    return {
+        "order": {key: encode_uint32(sort_order(webapp[key])) for key, _, _ in TABLE_COLUMNS},
+        "terms": {key: term_postings(webapp[key]) for key in ("protein_name", "species")},
+    }
+
+
+def report_summary(counts, species):
+    """Chart entries and headline numbers for one report, from its slice of the aggregate."""
+    bucket_counts = counts.groupby("locus_bucket")["n"].sum()
     bucket_entries = [(b, int(bucket_counts.get(b, 0))) for b in BUCKET_ORDER if bucket_counts.get(b, 0) > 0]
     for extra in (REVIEW_BUCKET, UNKNOWN_BUCKET):
         if bucket_counts.get(extra, 0) > 0:
             bucket_entries.append((extra, int(bucket_counts[extra])))
-    bucket_colors = [BUCKET_COLOR_VAR[b] for b, _ in bucket_entries]
-    localization_chart = svg_bar_chart(bucket_entries, bucket_colors)
-
-    conf_counts = report_df["localization_confidence"].value_counts()
-    conf_entries = [(c, int(conf_counts.get(c, 0))) for c in CONF_ORDER if conf_counts.get(c, 0) > 0]
-    conf_colors = [CONF_COLOR_VAR[c] for c, _ in conf_entries]
-    confidence_chart = svg_bar_chart(conf_entries, conf_colors, width=480, label_w=110)
-
-    gram_counts = report_df["gram_stain"].value_counts()
-    gram_entries = [(GRAM_LABEL[g], int(gram_counts.get(g, 0))) for g in GRAM_ORDER if gram_counts.get(g, 0) > 0]
-    gram_colors = [GRAM_COLOR_VAR[g] for g in GRAM_ORDER if gram_counts.get(g, 0) > 0]
-    gram_chart = svg_bar_chart(gram_entries, gram_colors, width=480, label_w=110)
-
-    n_proteins = len(report_df)
-    n_samples = report_df["sample_id"].nunique()
-    n_species = report_df["tax_id"].nunique()
-    n_high = int(conf_counts.get("High", 0))
-    n_moderate = int(conf_counts.get("Moderate", 0))
-    n_low = int(conf_counts.get("Low", 0))
-    generated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
-    table_records = report_webapp_df.astype(object).where(pd.notnull(report_webapp_df), None).to_dict(orient="records")
-    table_json = json.dumps(table_records, default=str)
+    conf_counts = counts.groupby("localization_confidence")["n"].sum()
+    gram_counts = counts.groupby("gram_stain")["n"].sum()
+    return {
+        "bucket_entries": bucket_entries,
+        "conf_entries": [(c, int(conf_counts.get(c, 0))) for c in CONF_ORDER if conf_counts.get(c, 0) > 0],
+        "gram_entries": [(g, int(gram_counts.get(g, 0))) for g in GRAM_ORDER if gram_counts.get(g, 0) > 0],
+        "n_proteins": int(counts["n"].sum()),
+        "n_samples": counts["sample_id"].nunique(),
+        "n_species": species["tax_id"].nunique(),
+        "n_high": int(conf_counts.get("High", 0)),
+        "n_moderate": int(conf_counts.get("Moderate", 0)),
+        "n_low": int(conf_counts.get("Low", 0)),
+    }
 
-    esc_title = html.escape(title)
 
-    html_doc = f"""<!doctype html>
-<html lang="en">
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<title>{esc_title}</title>
-<style>{CSS}</style>
-</head>
-<body>
-<h1>{esc_title}</h1>
-<div class="meta">Generated {generated_at} &middot; {n_proteins} proteins &middot; {n_samples} samples &middot; {n_species} species{extra_meta}</div>
-
-<div class="stat-row">
-  <div class="stat-tile"><div class="value">{n_proteins}</div><div class="label">Proteins classified</div></div>
-  <div class="stat-tile"><div class="value">{n_samples}</div><div class="label">Samples</div></div>
-  <div class="stat-tile"><div class="value">{n_species}</div><div class="label">Species</div></div>
-  <div class="stat-tile"><div class="value">{n_high}</div><div class="label">High confidence</div></div>
-  <div class="stat-tile"><div class="value">{n_moderate}</div><div class="label">Moderate confidence</div></div>
-  <div class="stat-tile"><div class="value">{n_low}</div><div class="label">Low confidence</div></div>
+def summary_sections(summary):
+    localization_chart = svg_bar_chart(
+        summary["bucket_entries"], [BUCKET_COLOR_VAR[b] for b, _ in summary["bucket_entries"]]
+    )
+    confidence_chart = svg_bar_chart(
+        summary["conf_entries"], [CONF_COLOR_VAR[c] for c, _ in summary["conf_entries"]], width=480, label_w=110
+    )
+    gram_chart = svg_bar_chart(
+        [(GRAM_LABEL[g], n) for g, n in summary["gram_entries"]],
+        [GRAM_COLOR_VAR[g] for g, _ in summary["gram_entries"]],
+        width=480,
+        label_w=110,
+    )
+    return f"""<div class="stat-row">
+  <div class="stat-tile"><div class="value">{summary["n_proteins"]}</div><div class="label">Proteins classified</div></div>
+  <div class="stat-tile"><div class="value">{summary["n_samples"]}</div><div class="label">Samples</div></div>
+  <div class="stat-tile"><div class="value">{summary["n_species"]}</div><div class="label">Species</div></div>
+  <div class="stat-tile"><div class="value">{summary["n_high"]}</div><div class="label">High confidence</div></div>
+  <div class="stat-tile"><div class="value">{summary["n_moderate"]}</div><div class="label">Moderate confidence</div></div>
+  <div class="stat-tile"><div class="value">{summary["n_low"]}</div><div class="label">Low confidence</div></div>
 </div>
 
 <div class="card">
@@ -632,7 +1177,31 @@ def write_report(report_df, report_webapp_df, filename, title, extra_meta=""):
     <h2>Gram stain</h2>
     {gram_chart}
   </div>
-</div>
+</div>"""
+
+
+def write_report(summary, report_webapp_df, filename, title, extra_meta=""):
+    n_proteins = summary["n_proteins"]
+    generated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+    esc_title = html.escape(title)
+
+    # Written section by section: the table payload goes out one column at a
+    # time, so the whole document never has to exist in memory at once.
+    with open(filename, "w") as f:
+        f.write(f"""<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{esc_title}</title>
+<style>{CSS}</style>
+</head>
+<body>
+<h1>{esc_title}</h1>
+<div class="meta">Generated {generated_at} &middot; {n_proteins} proteins &middot; {summary["n_samples"]} samples &middot; {summary["n_species"]} species{extra_meta}</div>
+
+{summary_sections(summary)}
 
 <div class="card">
   <h2>Per-protein calls</h2>
@@ -646,52 +1215,295 @@ def write_report(report_df, report_webapp_df, filename, title, extra_meta=""):
     </select>
     <span id="row-count"></span>
   </div>
-  <div class="table-wrap">
-    <table>
+  <div class="table-wrap" id="table-wrap">
+    <table style="min-width:{table_width}px">
+      <colgroup>{table_colgroup}</colgroup>
       <thead><tr>{table_header_cells}</tr></thead>
       <tbody id="protein-rows"></tbody>
     </table>
   </div>
+  <div class="row-detail" id="row-detail">Click a row to see its full rationale.</div>
 </div>
 
-<script type="application/json" id="protein-data">{table_json}</script>
-<script>{JS}</script>
+<script type="application/json" id="protein-data">""")
+        f.write(f'{{"n": {n_proteins}, "columns": {{')
+        for i, key in enumerate(report_webapp_df.columns):
+            f.write(", " if i else "")
+            f.write(f"{json.dumps(key)}: {json.dumps(encode_column(report_webapp_df[key]), default=str)}")
+        f.write("}}</script>\\n")
+        f.write('<script type="application/json" id="report-index">')
+        f.write(json.dumps(build_report_index(report_webapp_df)))
+        f.write(f"</script>\\n<script>{JS}</script>\\n</body>\\n</html>\\n")
+    return n_proteins
+
+
+REPORT_PROTEIN_THRESHOLD = 100000
+# Per-sample reports: proteins without a sample_id get a report of their own
+UNKNOWN_SAMPLE_ID = "unknown"
+
+
+# Per-sample reports are independent, so they are written by a pool of worker
+# processes (one per task CPU). Workers read their sample's rows from the spill
+# files themselves; results are collected in sample order so the log stays
+# deterministic.
+REPORT_WORKERS = max(1, int("${task.cpus}"))
+
+
+def load_report_rows(paths):
+    return pd.concat([pd.read_pickle(path) for path in paths])
+
+
+def sample_report_filename(sample_id):
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", str(sample_id))
+    return f"localization_report_{safe_id}.html"
+
+
+def write_sample_report(sample_id, paths, summary, total_proteins, total_samples, outdir="."):
+    filename = sample_report_filename(sample_id)
+    n_proteins = write_report(
+        summary,
+        load_report_rows(paths),
+        filename=os.path.join(outdir, filename),
+        title=f"Surface protein localization report - {sample_id}",
+        extra_meta=f" &middot; part of a {total_proteins}-protein, {total_samples}-sample run",
+    )
+    return filename, n_proteins
+
+
+def write_index_page(summary, sample_summaries, filename):
+    generated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    sample_rows = "\\n".join(
+        "<tr>"
+        f'<td><a href="{html.escape(sample_report_filename(sample_id))}">{html.escape(str(sample_id))}</a></td>'
+        f'<td>{s["n_proteins"]}</td><td>{s["n_species"]}</td>'
+        f'<td>{s["n_high"]}</td><td>{s["n_moderate"]}</td><td>{s["n_low"]}</td>'
+        "</tr>"
+        for sample_id, s in sample_summaries.items()
+    )
+    html_doc = f"""<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Surface protein localization report</title>
+<style>{CSS}</style>
+</head>
+<body>
+<h1>Surface protein localization report</h1>
+<div class="meta">Generated {generated_at} &middot; {summary["n_proteins"]} proteins &middot; {summary["n_samples"]} samples &middot; {summary["n_species"]} species &middot; one report per sample</div>
+
+{summary_sections(summary)}
+
+<div class="card">
+  <h2>Per-sample reports</h2>
+  <div class="table-wrap">
+    <table>
+      <thead><tr><th>Sample</th><th>Proteins</th><th>Species</th><th>High</th><th>Moderate</th><th>Low</th></tr></thead>
+      <tbody>
+{sample_rows}
+      </tbody>
+    </table>
+  </div>
+</div>
 </body>
 </html>
 """
 
     with open(filename, "w") as f:
         f.write(html_doc)
-    print(f"Wrote {filename} ({n_proteins} proteins)")
 
 
-REPORT_PROTEIN_THRESHOLD = 1000
+# ---------------------------------------------------------------------------
+# Main loop
+# ---------------------------------------------------------------------------
+
+def run(mergedtable, outdir=".", workers=1, backend=None, stage=None):
+    """Classify a merged table and write the localization tables and HTML report(s) to outdir.
+
+    The table is streamed CHUNK_SIZE rows at a time. backend is a
+    columnar_backend() to also write the tables as partitioned datasets, and
+    stage(name), if given, is entered around each step of the run
+    ("classification", "build_webapp_table", "csv_writing", "write_report") so
+    benchmarks/benchmark_localization.py can time them. Returns the number of
+    proteins, samples and distinct feature combinations classified, and the
+    report mode.
+    """
+    stage = stage or (lambda name: nullcontext())
+    os.makedirs(outdir, exist_ok=True)
+
+    dtypes = scan_dtypes(mergedtable)
+    missing = REQUIRED_COLUMNS - set(dtypes)
+    if missing:
+        raise SystemExit(f"ERROR: input table is missing expected columns: {sorted(missing)}")
+    dtypes["sign_cspos"] = np.dtype(object)
+
+    spill_dir = tempfile.mkdtemp(prefix="report_parts_", dir=outdir)
+    sample_parts = {}
+    count_parts = []
+    species_parts = []
+    n_parts = 0
+    total_proteins = 0
+    total_distinct = 0
+    total_membrane = 0
+
+    # A table without proteins still goes through once, writing empty tables and report
+    for chunk_no, df in enumerate(read_chunks(mergedtable, dtype=dtypes)):
+        with stage("classification"):
+            df["cs_prob"] = df["sign_cspos"].str.extract(r"Pr:\\s*([\\d.]+)").astype(float)
+            results, n_distinct = classify_memoized(df)
+            df = pd.concat([df, results], axis=1)
+            df["locus_bucket"] = df["predicted_localization"].map(
+                {loc: bucket(loc) for loc in df["predicted_localization"].unique()}
+            )
 
-if len(df) > REPORT_PROTEIN_THRESHOLD:
-    total_proteins = len(df)
-    total_samples = df["sample_id"].nunique()
+        with stage("build_webapp_table"):
+            webapp_df = build_webapp_table(df)
+
+        with stage("csv_writing"):
+            write_mode = "w" if chunk_no == 0 else "a"
+            full_df = df.drop(columns=["cs_prob", "locus_bucket"])
+            webapp_df.to_csv(
+                os.path.join(outdir, "localization.csv"), mode=write_mode, header=chunk_no == 0, index=False
+            )
+            full_df.to_csv(
+                os.path.join(outdir, "localization_full.csv"), mode=write_mode, header=chunk_no == 0, index=False
+            )
+            if backend:
+                if chunk_no == 0:
+                    webapp_schema = arrow_schema(backend[0], webapp_df.dtypes)
+                    full_schema = arrow_schema(backend[0], full_df.dtypes)
+                write_partitions(
+                    backend, webapp_schema, webapp_df, os.path.join(outdir, f"localization.{backend[2]}"),
+                    f"part-{chunk_no}",
+                )
+                write_partitions(
+                    backend, full_schema, full_df, os.path.join(outdir, f"localization_full.{backend[2]}"),
+                    f"part-{chunk_no}",
+                )
+
+        total_proteins += len(df)
+        total_distinct += n_distinct
+        total_membrane += int(df["locus_bucket"].isin(MEMBRANE_BUCKETS).sum())
+
+        with stage("write_report"):
+            count_parts.append(df.groupby(REPORT_COUNT_KEYS, dropna=False).size().rename("n").reset_index())
+            species_parts.append(df[["sample_id", "tax_id"]].drop_duplicates())
+
+            # The index of a spilled row is its position in the input table, which
+            # restores the original order when parts are reloaded.
+            for sample_id, part in webapp_df.groupby("sample_id", sort=False, dropna=False):
+                part_path = os.path.join(spill_dir, f"part_{n_parts}.pkl")
+                part.to_pickle(part_path)
+                sample_parts.setdefault(sample_id, []).append(part_path)
+                n_parts += 1
+
+        print(f"Processed chunk {chunk_no + 1} ({len(df)} proteins, {total_proteins} so far)")
+
+    reuse_ratio = 1 - total_distinct / total_proteins if total_proteins else 0.0
     print(
-        f"Run has {total_proteins} proteins (over the {REPORT_PROTEIN_THRESHOLD}-protein threshold) - "
-        "writing one HTML report per sample instead of a single combined report to keep each file light."
+        f"Classified {total_distinct} distinct feature combinations for {total_proteins} proteins "
+        f"({reuse_ratio:.1%} of rows reused an earlier call)"
     )
-    for sample_id, idx in df.groupby("sample_id", sort=True).groups.items():
-        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", str(sample_id))
-        write_report(
-            df.loc[idx],
-            webapp_df.loc[idx],
-            filename=f"localization_report_{safe_id}.html",
-            title=f"Surface protein localization report - {sample_id}",
-            extra_meta=f" &middot; part of a {total_proteins}-protein, {total_samples}-sample run",
+    print(f"Wrote localization.csv ({total_proteins} rows, {len(webapp_df.columns)} columns)")
+    print("Wrote localization_full.csv")
+    if backend:
+        print(f"Wrote localization.{backend[2]} and localization_full.{backend[2]} (partitioned by sample_id)")
+
+    report_counts = pd.concat(count_parts).groupby(REPORT_COUNT_KEYS, dropna=False)["n"].sum().reset_index()
+    report_species = pd.concat(species_parts).drop_duplicates()
+
+    membrane_fraction = total_membrane / total_proteins if total_proteins else 0.0
+    if membrane_fraction > 0.4:
+        print(
+            f"WARNING: {membrane_fraction:.0%} of proteins were classified as membrane "
+            "(integral multi-pass or single-pass anchored). Real proteomes are typically "
+            "~20-30% membrane protein; a fraction this high usually means TMHMM and/or "
+            "Phobius are over-calling TM helices on this input (e.g. low-complexity or "
+            "repetitive sequence) rather than reflecting genuine biology - spot-check a "
+            "handful of these proteins' annotations before trusting the output."
         )
-else:
-    write_report(
-        df, webapp_df,
-        filename="localization_report.html",
-        title="Surface protein localization report",
-    )
 
-with open("versions.yml", "w") as vf:
-    import sys
-    vf.write('"${task.process}":\\n')
-    vf.write(f"    python: {sys.version.split()[0]}\\n")
-    vf.write(f"    pandas: {pd.__version__}\\n")
+    per_sample_reports = total_proteins > REPORT_PROTEIN_THRESHOLD
+    with stage("write_report"):
+        if per_sample_reports:
+            sample_ids = sorted(sample_id for sample_id in sample_parts if not pd.isna(sample_id))
+            report_sample_ids = pd.Series(report_counts["sample_id"])
+            species_sample_ids = pd.Series(report_species["sample_id"])
+            unknown_parts = [path for sample_id, paths in sample_parts.items() if pd.isna(sample_id) for path in paths]
+            if unknown_parts:
+                unknown_id = UNKNOWN_SAMPLE_ID
+                while unknown_id in sample_parts:
+                    unknown_id += "_"
+                n_unknown = int(report_counts.loc[report_counts["sample_id"].isna(), "n"].sum())
+                print(f"WARNING: {n_unknown} proteins have no sample_id - they are reported as sample '{unknown_id}'")
+                sample_parts[unknown_id] = unknown_parts
+                sample_ids.append(unknown_id)
+                report_sample_ids = report_sample_ids.astype(object).where(report_sample_ids.notna(), unknown_id)
+                species_sample_ids = species_sample_ids.astype(object).where(species_sample_ids.notna(), unknown_id)
+            total_samples = len(sample_ids)
+            print(
+                f"Run has {total_proteins} proteins (over the {REPORT_PROTEIN_THRESHOLD}-protein threshold) - "
+                "writing one HTML report per sample instead of a single combined report to keep each file light."
+            )
+            sample_counts = dict(tuple(report_counts.groupby(report_sample_ids, sort=False)))
+            sample_species = dict(tuple(report_species.groupby(species_sample_ids, sort=False)))
+            sample_summaries = {
+                sample_id: report_summary(sample_counts[sample_id], sample_species[sample_id])
+                for sample_id in sample_ids
+            }
+            report_args = (
+                sample_ids,
+                [sample_parts[sample_id] for sample_id in sample_ids],
+                [sample_summaries[sample_id] for sample_id in sample_ids],
+                repeat(total_proteins),
+                repeat(total_samples),
+                repeat(outdir),
+            )
+            n_workers = min(workers, total_samples)
+            if n_workers > 1:
+                # fork explicitly: workers inherit this module as it was loaded
+                # (the benchmark renders it from the template) instead of
+                # re-importing it.
+                with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("fork")) as pool:
+                    for filename, n_proteins in pool.map(write_sample_report, *report_args):
+                        print(f"Wrote {filename} ({n_proteins} proteins)")
+            else:
+                for filename, n_proteins in map(write_sample_report, *report_args):
+                    print(f"Wrote {filename} ({n_proteins} proteins)")
+
+            write_index_page(
+                report_summary(report_counts, report_species),
+                sample_summaries,
+                filename=os.path.join(outdir, "localization_report_index.html"),
+            )
+            print(f"Wrote localization_report_index.html ({total_samples} sample reports)")
+        else:
+            all_parts = [path for paths in sample_parts.values() for path in paths]
+            report_webapp_df = load_report_rows(all_parts).sort_index(kind="stable") if all_parts else webapp_df
+            n_proteins = write_report(
+                report_summary(report_counts, report_species),
+                report_webapp_df,
+                filename=os.path.join(outdir, "localization_report.html"),
+                title="Surface protein localization report",
+            )
+            print(f"Wrote localization_report.html ({n_proteins} proteins)")
+
+    shutil.rmtree(spill_dir)
+    return {
+        "proteins": total_proteins,
+        "samples": int(report_counts["sample_id"].nunique()),
+        "distinct_combinations": total_distinct,
+        "report_mode": "per-sample" if per_sample_reports else "single",
+    }
+
+
+if __name__ == "__main__":
+    backend = columnar_backend() if COLUMNAR_OUTPUT else None
+    run("${mergedtable}", ".", REPORT_WORKERS, backend)
+
+    with open("versions.yml", "w") as vf:
+        vf.write('"${task.process}":\\n')
+        vf.write(f"    python: {sys.version.split()[0]}\\n")
+        vf.write(f"    pandas: {pd.__version__}\\n")
+        if backend:
+            vf.write(f"    pyarrow: {backend[0].__version__}\\n")
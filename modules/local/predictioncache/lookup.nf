@@ -0,0 +1,44 @@
+process PREDICTION_CACHE_LOOKUP {
+    tag "$meta.id"
+
+    conda "conda-forge::pandas=1.4.3"
+    container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
+        'biocontainers/pandas:1.4.3' }
+
+    input:
+    tuple val(meta), path(faa)
+    val cache
+    val versions
+
+    output:
+    tuple val(meta), path("${prefix}_uncached.faa")                                       , emit: faa
+    tuple val(meta), path("${prefix}_cache_manifest.tsv"), path("${prefix}_cache_hits.jsonl"), emit: manifest
+    path "versions.yml"                                                                    , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    prediction_cache.py lookup "${cache}" ${faa} ${prefix} --versions "${versions}" --gram "${meta.gram}"
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+
+    stub:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    cp ${faa} ${prefix}_uncached.faa
+    touch ${prefix}_cache_manifest.tsv ${prefix}_cache_hits.jsonl
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
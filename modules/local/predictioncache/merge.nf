@@ -0,0 +1,53 @@
+process PREDICTION_CACHE_MERGE {
+    tag "$meta.id"
+
+    conda "conda-forge::pandas=1.4.3"
+    container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
+        'biocontainers/pandas:1.4.3' }
+
+    input:
+    tuple val(meta), path(signalp), path(tmhmm), path(psortb), path(phobius), path(manifest), path(hits), val(containers)
+    val versions
+
+    output:
+    tuple val(meta), path("${prefix}_signalp_complete.csv"), path("${prefix}_tmhmm_complete.csv"), path("${prefix}_psortb_complete.csv"), path("${prefix}_phobius_complete.txt"), emit: tables
+    tuple val(meta), path("${prefix}_cache_stats.tsv")                                                                                                              , emit: stats
+    tuple val(meta), path("${prefix}_cache_rows.jsonl")                                                                                                             , emit: rows
+    path "versions.yml"                                                                                                                                             , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    prediction_cache.py merge ${prefix} \\
+        --meta-id "${meta.id}" \\
+        --tax-id "${meta.tax}" \\
+        --versions "${versions}" \\
+        --containers "${containers}" \\
+        --gram "${meta.gram}" \\
+        --signalp ${signalp} --signalp-output ${prefix}_signalp_complete.csv \\
+        --tmhmm ${tmhmm} --tmhmm-output ${prefix}_tmhmm_complete.csv \\
+        --psortb ${psortb} --psortb-output ${prefix}_psortb_complete.csv \\
+        --phobius ${phobius} --phobius-output ${prefix}_phobius_complete.txt
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+
+    stub:
+    prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    touch ${prefix}_signalp_complete.csv ${prefix}_tmhmm_complete.csv ${prefix}_psortb_complete.csv ${prefix}_phobius_complete.txt
+    touch ${prefix}_cache_stats.tsv ${prefix}_cache_rows.jsonl
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
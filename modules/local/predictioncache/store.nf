@@ -0,0 +1,38 @@
+process PREDICTION_CACHE_STORE {
+    tag "$cache"
+    // The only task writing to the cache: one at a time, after every sample is merged
+    maxForks 1
+
+    conda "conda-forge::pandas=1.4.3"
+    container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
+        'biocontainers/pandas:1.4.3' }
+
+    input:
+    path rows
+    val cache
+
+    output:
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    prediction_cache.py store "${cache}" ${rows}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+
+    stub:
+    """
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
@@ -1,5 +1,5 @@
 process PSORTB_PARSE {
-    tag "${txt}"
+    tag "$meta.id"
 
     conda "conda-forge::pandas=1.4.3"
     container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -17,8 +17,9 @@ process PSORTB_PARSE {
     task.ext.when == null || task.ext.when
 
     script:
+    prefix = task.ext.prefix ?: "${meta.id}"
     """
-    parse_psortb.py ${txt}
+    parse_psortb.py ${txt} --output ${prefix}_psortb_filtered.csv --processes ${task.cpus}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -28,9 +29,9 @@ process PSORTB_PARSE {
     """
 
     stub:
-    basename = txt.baseName
+    prefix = task.ext.prefix ?: "${meta.id}"
     """
-    touch ${basename}_filtered.csv
+    touch ${prefix}_psortb_filtered.csv
     
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
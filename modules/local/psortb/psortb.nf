@@ -10,6 +10,7 @@ process PSORTB_PSORTB {
 
     output:
     tuple val(meta), path("*_psortb.txt")   , emit: txt
+    tuple val(meta), val("${task.container ?: ''}"), emit: container
     path "versions.yml"                     , emit: versions
 
     when:
@@ -19,8 +20,8 @@ process PSORTB_PSORTB {
     prefix = task.ext.prefix ?: faa.baseName
     mode     = meta.gram == "gram-positive" ? "--positive" : "--negative"
     """
-    simplify_headers.sh ${faa} ${faa.baseName}_simplified.faa
-    psortb ${mode} -v --seq ${faa.baseName}_simplified.faa --outdir output_${faa.baseName}
+    # ${faa} has been through PSORTB_SANITISE: headers cut at the first space, one line per sequence
+    psortb ${mode} -v --seq ${faa} --outdir output_${faa.baseName}
 
     mv output_${faa.baseName}/*_psortb_*.txt ${prefix}_psortb.txt
     rm -rf output_${faa.baseName}
@@ -0,0 +1,41 @@
+process PSORTB_SANITISE {
+    tag "$faa"
+
+    conda "conda-forge::pandas=1.4.3"
+    container { workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pandas:1.4.3' :
+        'biocontainers/pandas:1.4.3' }
+
+    input:
+    tuple val(meta), path(faa)
+
+    output:
+    tuple val(meta), path("sanitised/*.faa"), emit: faa
+    path "versions.yml"                     , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    // The cleaned chunk keeps its file name, so PSORTB_PSORTB's outputs keep their chunk index
+    """
+    mkdir sanitised
+    sanitise_fasta.py ${faa} sanitised/${faa.name} --simplify-headers --unwrap
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+
+    stub:
+    """
+    mkdir sanitised
+    touch sanitised/${faa.name}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
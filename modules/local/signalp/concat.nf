@@ -22,8 +22,6 @@ process SIGNALP_CONCAT {
     """
     concat_signalp.py "${meta.id}" "${meta.tax}" ${outputname} ${outputtxt}
 
-    filter_signalp.py ${outputname}
-
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
@@ -9,6 +9,7 @@ process SIGNALP_SIGNALP {
 
     output:
     tuple val(meta), path("*/*_prediction_results.txt")   , emit: outputtxt
+    tuple val(meta), val("${task.container ?: ''}")       , emit: container
     path "versions.yml"                                   , emit: versions
 
     when:
@@ -16,6 +17,7 @@ process SIGNALP_SIGNALP {
 
     script:
     format = 'txt'
+    mode = meta.signalp_mode ?: 'slow-sequential'
     """
     basename=\$(basename "${faa}" .faa)  # Remove the file extension
     splitname="\${basename#split_}"  # Remove the 'split_' prefix
@@ -25,7 +27,7 @@ process SIGNALP_SIGNALP {
     signalp6 \\
         --fastafile ${faa} \\
         --output_dir \$outputdir \\
-        --mode 'slow-sequential' \\
+        --mode '${mode}' \\
         --organism 'other' \\
         --format ${format}
 
@@ -64,10 +64,10 @@ workflow PIPELINE_INITIALISATION {
         nextflow_cli_args
     )
 
-    // //
-    // // Custom validation for pipeline parameters
-    // //
-    // validateInputParameters()
+    //
+    // Custom validation for pipeline parameters
+    //
+    validateInputParameters()
 
     //
     // Create channel from input file provided through params.input
@@ -148,6 +148,22 @@ workflow PIPELINE_COMPLETION {
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 */
 
+//
+// Check and validate pipeline parameters
+//
+def validateInputParameters() {
+    // The head node's CPUs say nothing about what a SLURM or cloud executor will run the chunks on
+    if (params.split_plan && !params.split_cpus) {
+        error("--split_plan needs --split_cpus: the number of CPUs the pipeline's tasks can use at once, e.g. the CPUs of your cluster allocation.")
+    }
+    if (params.split_balance && !params.split_residues && !params.split_plan) {
+        error("--split_balance only applies with --split_residues or --split_plan.")
+    }
+    // The tasks open the SQLite file in place, which an object store (s3://, gs://, ...) can't serve
+    if (params.prediction_cache && (params.prediction_cache =~ /^[a-zA-Z][a-zA-Z0-9+.-]*:\/\// || !new File(params.prediction_cache).isAbsolute())) {
+        error("--prediction_cache must be an absolute local path, on a filesystem mounted on every node running tasks, not '${params.prediction_cache}'.")
+    }
+}
 
 //
 // Generate methods description for MultiQC
@@ -0,0 +1,35 @@
+"""bin/phobius_short.py against hand-written phobius -long and phobius -short pairs.
+
+The fixtures are not Phobius runs: they are written in Phobius' long and short
+formats, with a signal peptide, TM segments and neither, to pin down the
+derivation. Check it against real outputs with phobius_short.py --compare.
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_DIR, "tests", "fixtures", "phobius")
+
+sys.path.insert(0, os.path.join(REPO_DIR, "bin"))
+import phobius_short  # noqa: E402
+
+
+@pytest.mark.parametrize("name", ["signal_peptide", "multi_tm", "neither"])
+def test_derived_summary_matches_phobius_short(name, tmp_path):
+    derived = tmp_path / f"{name}_summary.txt"
+    phobius_short.write_short(os.path.join(FIXTURES, f"{name}_long.txt"), derived)
+    assert phobius_short.compare(derived, os.path.join(FIXTURES, f"{name}_short.txt")) == 0
+
+
+def test_signal_peptide_without_h_region():
+    features = [("SIGNAL", "1", "22", ""), ("DOMAIN", "23", "180", "NON CYTOPLASMIC.")]
+    assert phobius_short.short_line("P1", features).split() == ["P1", "0", "Y", "n1-22c22/23o"]
+
+
+def test_compare_counts_differing_lines(tmp_path):
+    derived = tmp_path / "derived.txt"
+    derived.write_text(phobius_short.SHORT_HEADER + "\nEFTU_ECOLI 0 0 o\n")
+    assert phobius_short.compare(derived, os.path.join(FIXTURES, "neither_short.txt")) == 2
@@ -0,0 +1,151 @@
+"""classify_frame() and classify_memoized() against the row-at-a-time classify()."""
+
+import itertools
+import os
+import re
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(REPO_DIR, "modules", "local", "predict_localization", "templates", "predict_localization.py")
+CALL_COLUMNS = ["predicted_localization", "localization_confidence", "rationale_notes"]
+
+
+def load_template(path):
+    """Render the Nextflow template and import it as a module, without running its main block."""
+    with open(path) as f:
+        source = f.read()
+    source = re.sub(r"\$\{(mergedtable|task\.process|task\.cpus|columnar_output)\}", lambda m: {
+        "task.cpus": "1", "columnar_output": "false",
+    }.get(m.group(1), ""), source)
+    source = re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), source)
+    module = types.ModuleType("predict_localization")
+    module.__file__ = path
+    # The template imports bin/columnar_output.py, which a task finds on its PATH.
+    sys.path.insert(0, os.path.join(REPO_DIR, "bin"))
+    sys.modules[module.__name__] = module
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module
+
+
+tpl = load_template(TEMPLATE)
+
+
+def merged_table(phob_sp=("Y", "0", ""), helices=(0, 1, 2, 3, np.nan)):
+    """Every combination of the values the decision tree branches on, two proteins each."""
+    rows = itertools.product(
+        ["SP", "LIPO", "TAT", "OTHER", "", np.nan],  # sign_prediction
+        phob_sp,
+        helices,  # PredHel
+        [0, 1, 2, 4],  # phob_TM
+        [
+            "Cytoplasmic", "CytoplasmicMembrane", "Periplasmic", "OuterMembrane",
+            "Extracellular", "Cellwall", "Unknown", "", np.nan,
+        ],  # psort_prediction
+        ["negative", "positive", "unknown", ""],  # gram_stain
+    )
+    df = pd.DataFrame(
+        list(rows), columns=["sign_prediction", "phob_SP", "PredHel", "phob_TM", "psort_prediction", "gram_stain"]
+    )
+    rng = np.random.default_rng(0)
+    n = len(df)
+    df["psort_score"] = np.where(df["psort_prediction"].isna(), np.nan, rng.choice([2.0, 7.5, 8.96, 9.0, 10.0], n))
+    df["cs_prob"] = np.where(rng.random(n) < 0.1, np.nan, rng.choice([0.31, 0.6999, 0.7, 0.95], n))
+    probs = rng.choice([0.0, 0.1, 0.25, 0.5], (n, len(tpl.SIGNAL_SUBTYPES)))  # with ties
+    for i, (_, col) in enumerate(tpl.SIGNAL_SUBTYPES):
+        df[col] = probs[:, i]
+    # Each combination a second time, in another order, for classify_memoized() to reuse.
+    return pd.concat([df, df.sample(frac=1, random_state=0)], ignore_index=True)
+
+
+def reference_calls(df):
+    return pd.DataFrame(df.apply(tpl.classify, axis=1).tolist(), index=df.index, columns=CALL_COLUMNS, dtype=object)
+
+
+TABLES = {
+    "string phob_SP, NaN helix counts": merged_table(),
+    "integer phob_SP": merged_table(phob_sp=(0, 1), helices=(0, 1, 2, 3)),
+    "integer helix counts": merged_table(helices=(0, 1, 2, 5)),
+}
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_classify_frame_matches_classify(name):
+    df = TABLES[name]
+    pd.testing.assert_frame_equal(tpl.classify_frame(df)[CALL_COLUMNS], reference_calls(df))
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_classify_memoized_matches_classify(name):
+    df = TABLES[name]
+    results, n_distinct = tpl.classify_memoized(df)
+    pd.testing.assert_frame_equal(results[CALL_COLUMNS], reference_calls(df))
+    assert n_distinct <= len(df) // 2
+
+
+def test_tables_cover_edge_cases():
+    df = TABLES["string phob_SP, NaN helix counts"]
+    calls = reference_calls(df)
+    positive = df["gram_stain"] == "positive"
+    assert df["PredHel"].isna().any()
+    assert df["psort_prediction"].isna().any()
+    assert (df["psort_prediction"] == "").any()
+    assert calls["rationale_notes"].eq("").any()
+    assert calls.loc[positive & (df["psort_prediction"] == "OuterMembrane"), "rationale_notes"].str.contains(
+        "Gram-stain mismatch"
+    ).all()
+    assert calls.loc[positive & (df["psort_prediction"] == "Periplasmic"), "rationale_notes"].str.contains(
+        "unusual for Gram-positive"
+    ).any()
+    assert TABLES["integer phob_SP"]["phob_SP"].dtype == np.int64
+
+
+def synthetic_table(n_proteins):
+    """A merged table of n_proteins proteins from the localization benchmark's generator."""
+    sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+    from benchmark_localization import synthetic_chunks
+
+    return next(synthetic_chunks(n_proteins, n_proteins, 0))
+
+
+def write_header_only_table(path):
+    synthetic_table(10).head(0).to_csv(path, index=False)
+
+
+def test_run_writes_empty_outputs_for_a_table_without_proteins(tmp_path):
+    mergedtable = tmp_path / "all_samples_mergedtable.csv"
+    write_header_only_table(mergedtable)
+    summary = tpl.run(str(mergedtable), str(tmp_path / "out"))
+    assert summary["proteins"] == 0
+    for name in ["localization.csv", "localization_full.csv", "localization_report.html"]:
+        assert (tmp_path / "out" / name).exists()
+    assert len(pd.read_csv(tmp_path / "out" / "localization.csv")) == 0
+
+
+def test_read_chunks_gives_the_header_when_pandas_gives_no_chunk(tmp_path, monkeypatch):
+    mergedtable = tmp_path / "all_samples_mergedtable.csv"
+    write_header_only_table(mergedtable)
+    read_csv = pd.read_csv
+    monkeypatch.setattr(tpl.pd, "read_csv", lambda path, chunksize=None, **kwargs: (
+        iter([]) if chunksize else read_csv(path, **kwargs)
+    ))
+    chunks = list(tpl.read_chunks(mergedtable))
+    assert len(chunks) == 1 and len(chunks[0]) == 0
+    assert tpl.REQUIRED_COLUMNS <= set(chunks[0].columns)
+
+
+def test_per_sample_reports_keep_proteins_without_a_sample_id(tmp_path, monkeypatch, capsys):
+    df = synthetic_table(200)
+    df.loc[df.index[:7], "sample_id"] = np.nan
+    mergedtable = tmp_path / "all_samples_mergedtable.csv"
+    df.to_csv(mergedtable, index=False)
+    monkeypatch.setattr(tpl, "REPORT_PROTEIN_THRESHOLD", 10)
+    summary = tpl.run(str(mergedtable), str(tmp_path / "out"))
+    assert summary["report_mode"] == "per-sample"
+    assert "WARNING: 7 proteins have no sample_id" in capsys.readouterr().out
+    assert (tmp_path / "out" / "localization_report_unknown.html").exists()
+    assert "localization_report_unknown.html" in (tmp_path / "out" / "localization_report_index.html").read_text()
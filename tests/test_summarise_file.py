@@ -0,0 +1,66 @@
+"""bin/summarise_file.py: per-protein counts and the --store probability store."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(REPO_DIR, "bin"))
+import summarise_file  # noqa: E402
+
+COLUMNS = ["OTHER", "SP(Sec/SPI)", "LIPO(Sec/SPII)"]
+
+
+def write_residue_file(path, protein_id, values):
+    """A SignalP per-residue output with one line of probabilities per residue."""
+    lines = [f"# Name={protein_id} generated protein", "# pos\taa\tlabel\t" + "\t".join(COLUMNS)]
+    for pos, row in enumerate(values, start=1):
+        lines.append(f"{pos}\tM\tS\t" + "\t".join(f"{v:.6f}" for v in row))
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def residue_files(tmp_path):
+    rng = np.random.default_rng(0)
+    proteins = {f"P{n}": rng.random((length, len(COLUMNS))) for n, length in enumerate([30, 1, 75])}
+    paths = []
+    for protein_id, values in proteins.items():
+        paths.append(tmp_path / f"{protein_id}_plot.txt")
+        write_residue_file(paths[-1], protein_id, values)
+    return proteins, [str(p) for p in paths]
+
+
+@pytest.mark.parametrize("store_dtype", summarise_file.STORE_DTYPES)
+def test_store_round_trips_the_probabilities(residue_files, tmp_path, store_dtype):
+    proteins, paths = residue_files
+    output_name = str(tmp_path / "S1")
+    summarise_file.process_multiple_files("S1", output_name, paths, processes=2, store_dtype=store_dtype)
+
+    store = summarise_file.ProbabilityStore(output_name)
+    assert store.columns == COLUMNS
+    assert "P9" not in store
+    for protein_id, values in proteins.items():
+        assert store[protein_id].dtype == np.dtype(store_dtype)
+        np.testing.assert_allclose(store[protein_id], values, atol=1e-3 if store_dtype == "float16" else 1e-6)
+
+    counts = pd.read_csv(output_name + ".csv").set_index("protein_id")
+    for protein_id, values in proteins.items():
+        assert counts.loc[protein_id, COLUMNS].tolist() == (values.round(6) > 0.50).sum(axis=0).tolist()
+
+
+def test_store_leaves_out_empty_files_and_other_columns(residue_files, tmp_path):
+    proteins, paths = residue_files
+    (tmp_path / "empty_plot.txt").write_text("")
+    other = tmp_path / "other_plot.txt"
+    other.write_text("# Name=Q1\n# pos\taa\tlabel\tOTHER\n1\tM\tS\t0.9\n")
+    output_name = str(tmp_path / "S1")
+    summarise_file.process_multiple_files("S1", output_name, paths + [str(tmp_path / "empty_plot.txt"), str(other)],
+                                          processes=1, store_dtype="float32")
+
+    store = summarise_file.ProbabilityStore(output_name)
+    assert sorted(store.proteins) == sorted(proteins)
+    assert len(store.values) == sum(len(values) for values in proteins.values())
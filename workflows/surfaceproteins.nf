@@ -6,23 +6,34 @@
 include { MULTIQC                } from '../modules/nf-core/multiqc/main'
 include { BAKTA_BAKTADBDOWNLOAD  } from '../modules/nf-core/bakta/baktadbdownload/main.nf'
 include { BAKTA_BAKTA            } from '../modules/nf-core/bakta/bakta/main.nf'
+include { PREDICTION_CACHE_LOOKUP } from '../modules/local/predictioncache/lookup'
+include { PREDICTION_CACHE_MERGE } from '../modules/local/predictioncache/merge'
+include { PREDICTION_CACHE_STORE } from '../modules/local/predictioncache/store'
 include { SPLIT_PROTEINS         } from '../modules/local/splitproteins'
 include { TMHMM_TMHMM            } from '../modules/local/tmhmm/tmhmm'
 include { PARSE_TMHMM            } from '../modules/local/tmhmm/parse'
 include { CONCAT_TMHMM           } from '../modules/local/tmhmm/concat'
-include { PHOBIUS                } from '../modules/local/phobius'
+include { PHOBIUS                } from '../modules/local/phobius/phobius'
+include { PHOBIUS_CONCAT         } from '../modules/local/phobius/concat'
 include { SIGNALP_SIGNALP        } from '../modules/local/signalp/signalp'
 include { SIGNALP_CONCAT         } from '../modules/local/signalp/concat'
+include { PSORTB_SANITISE        } from '../modules/local/psortb/sanitise'
 include { PSORTB_PSORTB          } from '../modules/local/psortb/psortb'
 include { PSORTB_PARSE           } from '../modules/local/psortb/parse'
 include { MERGE_TABLES           } from '../modules/local/mergetables'
 include { COLLATE_MERGEDTABLES   } from '../modules/local/collate_mergedtables/main'
+include { COLLATE_MERGEDTABLES as COLLATE_MERGEDTABLES_BATCH } from '../modules/local/collate_mergedtables/main'
 include { PREDICT_LOCALIZATION   } from '../modules/local/predict_localization/main'
 include { paramsSummaryMap       } from 'plugin/nf-schema'
 include { paramsSummaryMultiqc   } from '../subworkflows/nf-core/utils_nfcore_pipeline'
 include { softwareVersionsToYAML } from '../subworkflows/nf-core/utils_nfcore_pipeline'
 include { methodsDescriptionText } from '../subworkflows/local/utils_nfcore_surfaceproteins_pipeline'
 
+// Position of a per-chunk output (<chunk>_<suffix>.txt) among its sample's SPLIT_PROTEINS chunks
+def chunkIndex(file) {
+    (file.name =~ /_(\d+)_[a-z]+\.txt$/)[0][1] as int
+}
+
 /*
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     RUN MAIN WORKFLOW
@@ -61,9 +72,25 @@ workflow SURFACEPROTEINS {
         ch_annotation = ch_samplesheet
     }
 
-    SPLIT_PROTEINS( ch_annotation )
+    //
+    // Prediction cache: proteins already predicted in an earlier run are left out
+    // of SPLIT_PROTEINS and their cached results merged back in before MERGE_TABLES
+    //
+    if ( params.prediction_cache ) {
+        // A local absolute path, checked by validateInputParameters()
+        PREDICTION_CACHE_LOOKUP( ch_annotation, params.prediction_cache, params.prediction_cache_versions )
+        ch_versions = ch_versions.mix( PREDICTION_CACHE_LOOKUP.out.versions )
+        ch_proteins = PREDICTION_CACHE_LOOKUP.out.faa
+    } else {
+        ch_proteins = ch_annotation
+    }
+
+    SPLIT_PROTEINS( ch_proteins )
 
+    // The SignalP mode chosen by --split_plan travels with each sample's chunks
     SPLIT_PROTEINS.out.split_proteins
+        .join( SPLIT_PROTEINS.out.plan )
+        .map { meta, chunks, plan -> [ meta + [ signalp_mode: new groovy.json.JsonSlurper().parse(plan).signalp_mode ], chunks ] }
         .transpose() // This splits the tuple into individual elements
         .set { individual_split_proteins }
 
@@ -85,9 +112,12 @@ workflow SURFACEPROTEINS {
     //
     // Phobius
     //
-    PHOBIUS( ch_annotation )
+    PHOBIUS( individual_split_proteins )
     ch_versions = ch_versions.mix( PHOBIUS.out.versions )
 
+    PHOBIUS_CONCAT( PHOBIUS.out.txtlong.groupTuple(by: 0, sort: { a, b -> chunkIndex(a) <=> chunkIndex(b) }) )
+    ch_versions = ch_versions.mix( PHOBIUS_CONCAT.out.versions )
+
     //
     // SignalP
     //
@@ -101,10 +131,13 @@ workflow SURFACEPROTEINS {
     //
     // PSORTB
     //
-    PSORTB_PSORTB( ch_annotation )
+    PSORTB_SANITISE( individual_split_proteins )
+    ch_versions = ch_versions.mix( PSORTB_SANITISE.out.versions )
+
+    PSORTB_PSORTB( PSORTB_SANITISE.out.faa )
     ch_versions = ch_versions.mix( PSORTB_PSORTB.out.versions )
 
-    PSORTB_PARSE( PSORTB_PSORTB.out.txt )
+    PSORTB_PARSE( PSORTB_PSORTB.out.txt.groupTuple(by: 0, sort: { a, b -> chunkIndex(a) <=> chunkIndex(b) }) )
     ch_versions = ch_versions.mix( PSORTB_PARSE.out.versions )
 
 
@@ -114,25 +147,111 @@ workflow SURFACEPROTEINS {
     ch_output = SIGNALP_CONCAT.out.csv
         .join(CONCAT_TMHMM.out.csv, by: [0])
         .join(PSORTB_PARSE.out.csv, by: [0])
-        .join(PHOBIUS.out.txt, by: [0])
+        .join(PHOBIUS_CONCAT.out.txt, by: [0])
+
+    if ( params.prediction_cache ) {
+        // The containers each sample's chunks ran in, as tool=container pairs, stored
+        // with the new results and checked against --prediction_cache_versions
+        ch_containers = Channel.empty()
+            .mix(
+                SIGNALP_SIGNALP.out.container.map { meta, container -> [ meta.id, "signalp=${container}" ] },
+                TMHMM_TMHMM.out.container.map { meta, container -> [ meta.id, "tmhmm=${container}" ] },
+                PHOBIUS.out.container.map { meta, container -> [ meta.id, "phobius=${container}" ] },
+                PSORTB_PSORTB.out.container.map { meta, container -> [ meta.id, "psortb=${container}" ] }
+            )
+            .unique()
+            .groupTuple()
+            .map { id, containers -> [ id, containers.sort().join(',') ] }
+
+        // meta gained signalp_mode after SPLIT_PROTEINS, so join the lookup outputs on the sample ID
+        PREDICTION_CACHE_MERGE(
+            ch_output
+                .map { meta, signalp, tmhmm, psortb, phobius -> [ meta.id, meta, signalp, tmhmm, psortb, phobius ] }
+                .join( PREDICTION_CACHE_LOOKUP.out.manifest.map { meta, manifest, hits -> [ meta.id, manifest, hits ] } )
+                .join( ch_containers )
+                .map { id, meta, signalp, tmhmm, psortb, phobius, manifest, hits, containers -> [ meta, signalp, tmhmm, psortb, phobius, manifest, hits, containers ] },
+            params.prediction_cache_versions
+        )
+        ch_versions = ch_versions.mix( PREDICTION_CACHE_MERGE.out.versions )
+        ch_output = PREDICTION_CACHE_MERGE.out.tables
+
+        // The new results of every sample are written to the cache by a single task
+        PREDICTION_CACHE_STORE(
+            PREDICTION_CACHE_MERGE.out.rows.map { meta, rows -> rows }.collect(),
+            params.prediction_cache
+        )
+        ch_versions = ch_versions.mix( PREDICTION_CACHE_STORE.out.versions )
+
+        PREDICTION_CACHE_MERGE.out.stats
+            .map { meta, stats -> stats }
+            .collectFile(
+                storeDir: "${params.outdir}/pipeline_info",
+                name: 'prediction_cache_stats.tsv',
+                keepHeader: true,
+                skip: 1,
+                sort: true
+            )
+    }
 
     MERGE_TABLES( ch_output )
 
     //
     // Collate per-sample tables and predict protein localization
     //
-    ch_manifest = MERGE_TABLES.out.mergedtable
-        .map { meta, csv -> "${meta.id}\t${meta.gram}\t${csv.name}" }
-        .collectFile(name: 'manifest.tsv', newLine: true, seed: "sample_id\tgram\tfilename")
+    // Samples are collated in sample-ID order, so the collated table's row order
+    // doesn't depend on task completion order or on --collate_batch_size.
+    ch_sample_tables = MERGE_TABLES.out.mergedtable
+        .toSortedList { a, b -> a[0].id <=> b[0].id }
+        .flatMap()
+
+    if ( params.collate_batch_size > 0 ) {
+        //
+        // Tree reduction: batches of collate_batch_size sample tables are collated
+        // in parallel, then the batch tables are collated into the final one
+        //
+        ch_batches = ch_sample_tables
+            .buffer( size: params.collate_batch_size, remainder: true )
+            .toList()
+            .flatMap { batches ->
+                batches.withIndex().collect { batch, i -> [ [ id: "collate_batch_${String.format('%05d', i)}" ], batch ] }
+            }
 
-    ch_mergedtables = MERGE_TABLES.out.mergedtable
-        .map { meta, csv -> csv }
-        .collect()
+        ch_batch_manifests = ch_batches
+            .flatMap { meta, batch -> batch.collect { sample, csv -> [ meta.id, "${sample.id}\t${sample.gram}\t${csv.name}" ] } }
+            .collectFile(newLine: true, seed: "sample_id\tgram\tfilename", sort: 'index') { id, line -> [ "${id}_manifest.tsv", line ] }
+            .map { manifest -> [ manifest.name - '_manifest.tsv', manifest ] }
 
-    COLLATE_MERGEDTABLES( ch_manifest, ch_mergedtables )
+        COLLATE_MERGEDTABLES_BATCH(
+            ch_batches
+                .map { meta, batch -> [ meta.id, meta, batch.collect { sample, csv -> csv } ] }
+                .join( ch_batch_manifests )
+                .map { id, meta, csvs, manifest -> [ meta, manifest, csvs ] },
+            false
+        )
+        ch_versions = ch_versions.mix( COLLATE_MERGEDTABLES_BATCH.out.versions.first() )
+
+        ch_collate_tables = COLLATE_MERGEDTABLES_BATCH.out.csv
+            .toSortedList { a, b -> a[0].id <=> b[0].id }
+            .flatMap()
+        ch_manifest = ch_collate_tables
+            .map { meta, csv -> csv.name }
+            .collectFile(name: 'manifest.tsv', newLine: true, seed: 'filename', sort: 'index')
+    } else {
+        ch_collate_tables = ch_sample_tables
+        ch_manifest = ch_sample_tables
+            .map { meta, csv -> "${meta.id}\t${meta.gram}\t${csv.name}" }
+            .collectFile(name: 'manifest.tsv', newLine: true, seed: "sample_id\tgram\tfilename", sort: 'index')
+    }
+
+    COLLATE_MERGEDTABLES(
+        ch_manifest
+            .combine( ch_collate_tables.map { meta, csv -> csv }.collect().map { csvs -> [ csvs ] } )
+            .map { manifest, csvs -> [ [ id: 'all_samples' ], manifest, csvs ] },
+        params.columnar_output
+    )
     ch_versions = ch_versions.mix( COLLATE_MERGEDTABLES.out.versions )
 
-    PREDICT_LOCALIZATION( COLLATE_MERGEDTABLES.out.csv )
+    PREDICT_LOCALIZATION( COLLATE_MERGEDTABLES.out.csv.map { meta, csv -> csv }, params.columnar_output )
     ch_versions = ch_versions.mix( PREDICT_LOCALIZATION.out.versions )
 
     //